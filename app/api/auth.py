@@ -1,58 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from app.core.db import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from typing import Any, Awaitable, Optional, Tuple
+from app.core.db import get_db, release_connection
+from app.core.metrics import metrics
+from app.core.rate_limit import RateLimiter
+from app.core.security import (
+    PasswordPoolFull, create_access_token, get_password_hash_async, verify_password_async, verify_token
+)
 from app.core.config import settings
-from app.schemas.auth import UserCreate, UserLogin, Token, UserResponse
+from app.schemas.auth import UserCreate, UserLogin, Token, TokenData, UserResponse
 from app.models.user import User, AuthProvider
 from app.models.workspace import Workspace
 from app.models import UserWorkspaceRole, UserRole
+from app.services.user_cache import user_status_cache
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-@router.post("/register", response_model=Token)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    """Register a new user and create a workspace"""
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+STREAM_TICKET_PURPOSE = "metrics_stream"
+
+async def throttle_login(request: Request):
+    """Per-IP limit on auth attempts, checked before any password work"""
+    client_ip = request.client.host if request.client else "unknown"
+    allowed, error_info = await RateLimiter().check_login_attempt(client_ip)
+    if not allowed:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+            status_code=error_info.get("status_code", status.HTTP_429_TOO_MANY_REQUESTS),
+            detail=error_info["error"],
+            headers={"Retry-After": str(error_info["retry_after"])}
         )
-    
-    # Create workspace
+
+async def _run_password_hash(hash_call: Awaitable[Any]) -> Any:
+    try:
+        return await hash_call
+    except PasswordPoolFull:
+        metrics.incr("password_hash_rejections")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
+# The auth routes are async so they can await the hash pool; their sync DB work goes through
+# these helpers on a thread, so the round trips never block the event loop
+
+def _find_user(db: Session, email: str) -> Optional[User]:
+    """Look up a user and hand the connection back before the caller hashes"""
+    user = db.query(User).filter(User.email == email).first()
+    release_connection(db)
+    return user
+
+def _primary_role(db: Session, user_id: int) -> Optional[UserWorkspaceRole]:
+    # For MVP, assume the first workspace is the primary one
+    return db.query(UserWorkspaceRole).filter(
+        UserWorkspaceRole.user_id == user_id
+    ).first()
+
+def _create_account(db: Session, user_data: UserCreate, hashed_password: str) -> Tuple[User, Workspace]:
+    """Create the workspace, user and admin role in one transaction; flush assigns their ids"""
     workspace = Workspace(
         name=user_data.workspace_name,
         description=f"Workspace for {user_data.email}"
     )
-    db.add(workspace)
-    db.commit()
-    db.refresh(workspace)
-    
-    # Create user
-    hashed_password = get_password_hash(user_data.password)
     user = User(
         email=user_data.email,
         hashed_password=hashed_password,
         auth_provider=AuthProvider.EMAIL,
         is_verified=True  # Auto-verify for MVP
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.add_all([workspace, user])
+    db.flush()
     
     # Assign user as admin of the workspace
-    user_role = UserWorkspaceRole(
+    db.add(UserWorkspaceRole(
         user_id=user.id,
         workspace_id=workspace.id,
         role=UserRole.ADMIN
-    )
-    db.add(user_role)
+    ))
     db.commit()
+    db.refresh(user)
+    return user, workspace
+
+@router.post("/register", response_model=Token, dependencies=[Depends(throttle_login)])
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    """Register a new user and create a workspace"""
+    # Check if user already exists
+    if await asyncio.to_thread(_find_user, db, user_data.email):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    
+    # Hash without holding a DB connection
+    hashed_password = await _run_password_hash(get_password_hash_async(user_data.password))
+    
+    user, workspace = await asyncio.to_thread(_create_account, db, user_data, hashed_password)
+    user_status_cache.set(user.id, user.is_active)
     
     # Create access token
     access_token = create_access_token(
@@ -77,11 +123,13 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     )
 
-@router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", response_model=Token, dependencies=[Depends(throttle_login)])
+async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     """Login with email and password"""
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    user = await asyncio.to_thread(_find_user, db, user_data.email)
+    if not user or not user.hashed_password or not await _run_password_hash(
+        verify_password_async(user_data.password, user.hashed_password)
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -93,16 +141,15 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
             detail="User account is inactive"
         )
     
-    # Get user's primary workspace (for MVP, assume first workspace)
-    user_role = db.query(UserWorkspaceRole).filter(
-        UserWorkspaceRole.user_id == user.id
-    ).first()
+    # Get user's primary workspace
+    user_role = await asyncio.to_thread(_primary_role, db, user.id)
     
     if not user_role:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User has no workspace access"
         )
+    user_status_cache.set(user.id, user.is_active)
     
     # Create access token
     access_token = create_access_token(
@@ -127,13 +174,11 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     )
 
-def get_current_user(
+def get_token_data(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    from app.core.security import verify_token
-    
+) -> TokenData:
+    """Decode the access token once and trust its signed claims"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -141,37 +186,101 @@ def get_current_user(
     )
     
     payload = verify_token(token)
-    if payload is None:
+    # Stream tickets are signed with the same key but must never pass as a session
+    if payload is None or payload.get("purpose"):
         raise credentials_exception
     
-    email: str = payload.get("sub")
-    if email is None:
+    token_data = TokenData(
+        email=payload.get("sub"),
+        user_id=payload.get("user_id"),
+        workspace_id=payload.get("workspace_id"),
+        role=payload.get("role"),
+        exp=payload.get("exp")
+    )
+    if token_data.user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    # Deactivation is the one thing a signed token can't carry, so it is checked (and cached) here
+    if not user_status_cache.is_active(db, token_data.user_id):
         raise credentials_exception
     
-    return user
+    return token_data
 
-def get_current_user_with_workspace(
-    current_user: User = Depends(get_current_user),
+def create_stream_ticket(token_data: TokenData) -> str:
+    """Short-lived token that can only open a metrics stream; it carries the session's expiry"""
+    return create_access_token(
+        data={
+            "purpose": STREAM_TICKET_PURPOSE,
+            "user_id": token_data.user_id,
+            "workspace_id": token_data.workspace_id,
+            "session_exp": token_data.exp
+        },
+        expires_delta=timedelta(seconds=settings.LIVE_METRICS_TICKET_SECONDS)
+    )
+
+def get_stream_token_data(
+    ticket: str = Query(...),
     db: Session = Depends(get_db)
-) -> tuple[User, int, str]:
-    """Get current user with workspace context"""
-    from app.core.security import verify_token
+) -> TokenData:
+    """Ticket auth for EventSource clients, which can't send an Authorization header
     
-    # Get token from request
-    token = oauth2_scheme.__call__(None)
-    payload = verify_token(token)
+    The ticket lands in access logs, so it is short-lived and good for nothing but opening a stream.
+    """
+    payload = verify_token(ticket)
+    if payload is None or payload.get("purpose") != STREAM_TICKET_PURPOSE or payload.get("user_id") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired stream ticket"
+        )
+    
+    if not user_status_cache.is_active(db, payload["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired stream ticket"
+        )
     
-    workspace_id = payload.get("workspace_id")
-    role = payload.get("role")
+    return TokenData(
+        user_id=payload["user_id"],
+        workspace_id=payload.get("workspace_id"),
+        exp=payload.get("session_exp")
+    )
+
+def get_current_user(
+    token_data: TokenData = Depends(get_token_data),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user"""
+    user = db.query(User).filter(User.id == token_data.user_id).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user
+
+def get_operator(
+    token_data: TokenData = Depends(get_token_data)
+) -> TokenData:
+    """Token claims of a deployment operator (OPERATOR_EMAILS), for endpoints that see the whole process"""
+    operators = {email.lower() for email in settings.OPERATOR_EMAILS}
+    if not token_data.email or token_data.email.lower() not in operators:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only operators can use this endpoint"
+        )
     
-    if not workspace_id or not role:
+    return token_data
+
+def get_current_user_with_workspace(
+    token_data: TokenData = Depends(get_token_data)
+) -> tuple[TokenData, int, str]:
+    """Get the token's claims with workspace context, without loading the user"""
+    if not token_data.workspace_id or not token_data.role:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid token: missing workspace or role"
         )
     
-    return current_user, workspace_id, role
+    return token_data, token_data.workspace_id, token_data.role
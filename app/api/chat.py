@@ -1,22 +1,37 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 import time
+import json
 import secrets
-from app.core.db import get_db
+from typing import Optional
+from app.core.db import get_db, release_connection
+from app.core.circuit_breaker import circuit_breakers
+from app.core.metrics import metrics
 from app.core.rate_limit import RateLimiter
+from app.core.tracing import span, upstream_propagation
 from app.schemas.chat import ChatCompletionRequest, ChatCompletionResponse
-from app.models.model import Model
-from app.models.apikey import APIKey
-from app.models.provider import Provider
+from app.services.admission import admission_scheduler, AdmissionRejected
+from app.services.api_key_cache import KeyContext, api_key_cache
+from app.services.batch_processor import BatchProcessor
+from app.services.context_window import ContextWindowExceeded, fit_to_context
+from app.services.job_worker import interactive_traffic
+from app.services.live_metrics import live_metrics
+from app.services.model_catalog import model_catalog
+from app.services.pricing import BudgetExceeded, price_table, spend_counters
 from app.services.provider_manager import ProviderManager
+from app.services.semantic_cache import semantic_cache
+from app.services.stream_codec import StreamUsageMeter
+from app.services.tokens import estimate_prompt_tokens, estimate_text_tokens
 from app.services.usage_tracker import UsageTracker
 from app.core.security import verify_token
 
 router = APIRouter(prefix="/v1", tags=["chat"])
 
-def verify_api_key(request: Request, db: Session = Depends(get_db)) -> tuple[int, int]:
-    """Verify API key and return workspace_id and key_id"""
+def verify_api_key(request: Request, db: Session = Depends(get_db)) -> KeyContext:
+    """Verify API key and return its workspace, id and limits"""
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(
@@ -26,56 +41,48 @@ def verify_api_key(request: Request, db: Session = Depends(get_db)) -> tuple[int
     
     api_key = auth_header.split(" ")[1]
     
-    # Find the API key in the database
-    db_key = db.query(APIKey).filter(
-        APIKey.status == "active"
-    ).all()
-    
-    # Check each key (in production, use proper hashing)
-    for key in db_key:
-        if key.hashed_key == api_key:  # Simplified for MVP
-            return key.workspace_id, key.id
+    with span("auth.verify_api_key"):
+        key_context = api_key_cache.verify(db, api_key)
+    if not key_context:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
     
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid API key"
-    )
+    return key_context
+
+@router.get("/models")
+async def list_models(key_context: KeyContext = Depends(verify_api_key)):
+    """List models available to the workspace, compatible with OpenAI API"""
+    return {"object": "list", "data": await model_catalog.list_models(key_context.workspace_id)}
 
 @router.post("/chat/completions", response_model=ChatCompletionResponse)
 async def chat_completions(
     request: ChatCompletionRequest,
-    workspace_id: int, api_key_id: int = Depends(verify_api_key),
+    key_context: KeyContext = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
     """Chat completion endpoint compatible with OpenAI API"""
     start_time = time.time()
-    
-    # Get the API key details
-    api_key = db.query(APIKey).filter(APIKey.id == api_key_id).first()
-    if not api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key"
-        )
+    workspace_id, api_key_id = key_context.workspace_id, key_context.key_id
     
     # Check rate limits
     rate_limiter = RateLimiter()
-    can_proceed, error_info = rate_limiter.check_rate_limit(
-        str(api_key_id), api_key.rpm, api_key.tpm, api_key.daily_cap
+    can_proceed, error_info = await rate_limiter.check_rate_limit(
+        str(api_key_id), key_context.rpm, key_context.tpm, key_context.daily_cap
     )
     
     if not can_proceed:
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            status_code=error_info.get("status_code", status.HTTP_429_TOO_MANY_REQUESTS),
             detail=error_info["error"],
             headers={"Retry-After": str(error_info.get("retry_after", 60))}
         )
     
-    # Find the model
-    model = db.query(Model).filter(
-        Model.name == request.model,
-        Model.is_active == True
-    ).first()
+    # Find the model and its provider
+    provider_manager = ProviderManager(db)
+    with span("routing.resolve_model", model=request.model):
+        model, provider = provider_manager.resolve_model(workspace_id, request.model, request)
     
     if not model:
         raise HTTPException(
@@ -83,66 +90,162 @@ async def chat_completions(
             detail=f"Model '{request.model}' not found"
         )
     
-    # Get the provider
-    provider = db.query(Provider).filter(Provider.id == model.provider_id).first()
-    if not provider or not provider.is_active:
+    if not provider:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Model provider is not available"
         )
     
+    # Requests that can't fit the model's context window would only fail upstream
+    try:
+        request = fit_to_context(model, request)
+    except ContextWindowExceeded as e:
+        metrics.incr("context_rejections")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    # Serve paraphrases of earlier prompts without an upstream call
+    use_semantic_cache = semantic_cache.is_enabled(model, request)
+    if use_semantic_cache:
+        with span("cache.lookup"):
+            cached_response = await semantic_cache.lookup(workspace_id, request)
+        if cached_response:
+            await rate_limiter.increment_usage(str(api_key_id), 0)
+            UsageTracker(db).log_request(
+                workspace_id=workspace_id,
+                model_id=model.id,
+                api_key_id=api_key_id,
+                model_name=request.model,
+                prompt_tokens=0,
+                completion_tokens=0,
+                total_tokens=0,
+                latency_ms=(time.time() - start_time) * 1000,
+                success=True
+            )
+            metrics.incr("semantic_cache_hits")
+            await live_metrics.record(workspace_id, (time.time() - start_time) * 1000, 0, True)
+            return JSONResponse(cached_response, headers={"X-Cache": "semantic-hit"})
+    
+    # Don't hold a pooled DB connection while waiting on admission and the upstream
+    release_connection(db)
+    
+    # Charge the worst-case cost against spend budgets before going upstream
+    try:
+        with span("budget.reserve"):
+            reservation = await spend_counters.reserve(key_context, price_table.estimate(model, request))
+    except BudgetExceeded as e:
+        metrics.incr("budget_rejections")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    # Wait for a provider slot in the key's priority lane
+    try:
+        with span("admission.acquire", priority=key_context.priority.value):
+            release_slot = await admission_scheduler.acquire(provider, key_context.priority)
+    except AdmissionRejected as e:
+        await spend_counters.settle(reservation, 0)
+        metrics.incr("admission_rejections")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     try:
         # Get the appropriate adapter
-        provider_manager = ProviderManager(db)
         adapter = provider_manager.get_adapter(provider)
         
         # Make the request
         if request.stream:
             # Handle streaming
-            response_stream = await adapter.chat_completion(request, stream=True)
+            with interactive_traffic.track(), span("upstream.chat_completion", provider=provider.name, stream=True):
+                with upstream_propagation(provider):
+                    response_stream = await adapter.chat_completion(request, stream=True)
             
-            # For streaming, we need to return a StreamingResponse
-            # This is a simplified version - in production you'd want proper SSE handling
-            async def generate_stream():
-                async for chunk in response_stream:
-                    yield chunk
+            circuit_breakers.get(provider.id).record_success()
             
-            return StreamingResponse(generate_stream(), media_type="text/plain")
-        else:
-            # Handle non-streaming
-            response = await adapter.chat_completion(request, stream=False)
+            # Every adapter relays OpenAI chat.completion.chunk server-sent events. Streams are
+            # charged for the usage the upstream reports on its last chunk, or else for an estimate
+            # of the prompt and of the text actually relayed
+            meter = StreamUsageMeter()
+            accounted = False
             
-            # Calculate latency
-            latency_ms = (time.time() - start_time) * 1000
+            async def finish_stream(error_message: Optional[str] = None):
+                nonlocal accounted
+                release_slot()
+                # Without this an unstarted stream would keep its pooled upstream connection
+                await response_stream.aclose()
+                if accounted:
+                    return
+                accounted = True
+                
+                latency_ms = (time.time() - start_time) * 1000
+                usage = meter.usage or {}
+                prompt_tokens = usage.get("prompt_tokens") or estimate_prompt_tokens(request)
+                completion_tokens = usage.get("completion_tokens") or estimate_text_tokens(meter.content)
+                total_tokens = prompt_tokens + completion_tokens
+                cost_usd = price_table.cost(model, prompt_tokens, completion_tokens)
+                
+                await rate_limiter.increment_usage(str(api_key_id), total_tokens)
+                await spend_counters.settle(reservation, cost_usd)
+                await live_metrics.record(workspace_id, latency_ms, total_tokens, error_message is None)
+                metrics.incr("tokens_total", total_tokens)
+                await asyncio.to_thread(
+                    UsageTracker(db).log_request,
+                    workspace_id=workspace_id,
+                    model_id=model.id,
+                    api_key_id=api_key_id,
+                    model_name=request.model,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    total_tokens=total_tokens,
+                    latency_ms=latency_ms,
+                    success=error_message is None,
+                    error_message=error_message,
+                    cost_usd=cost_usd
+                )
             
-            # Extract token counts from response
-            usage = response.get("usage", {})
-            prompt_tokens = usage.get("prompt_tokens", 0)
-            completion_tokens = usage.get("completion_tokens", 0)
-            total_tokens = usage.get("total_tokens", 0)
-            
-            # Update rate limiting counters
-            rate_limiter.increment_usage(str(api_key_id), total_tokens)
+            async def generate_stream():
+                error_message = None
+                try:
+                    with interactive_traffic.track(), span("upstream.stream", provider=provider.name):
+                        async for chunk in response_stream:
+                            meter.feed(chunk)
+                            yield chunk
+                except Exception as e:
+                    error_message = str(e)
+                    raise
+                finally:
+                    await finish_stream(error_message)
             
-            # Log the request
-            usage_tracker = UsageTracker(db)
-            usage_tracker.log_request(
-                workspace_id=workspace_id,
-                model_id=model.id,
-                api_key_id=api_key_id,
-                model_name=request.model,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                latency_ms=latency_ms,
-                success=True
+            # The generator never runs if the client leaves before the body starts; the background
+            # task still does, so the slot, reservation and upstream response are released either way
+            return StreamingResponse(
+                generate_stream(),
+                media_type="text/event-stream",
+                background=BackgroundTask(finish_stream)
             )
-            
-            return response
+        else:
+            # Handle non-streaming
+            try:
+                with interactive_traffic.track(), span("upstream.chat_completion", provider=provider.name, stream=False):
+                    with upstream_propagation(provider):
+                        response = await adapter.chat_completion(request, stream=False)
+            finally:
+                release_slot()
+            circuit_breakers.get(provider.id).record_success()
             
     except Exception as e:
+        release_slot()
+        await spend_counters.settle(reservation, 0)
+        metrics.incr("upstream_errors")
+        circuit_breakers.get(provider.id).record_failure()
+        
         # Calculate latency
         latency_ms = (time.time() - start_time) * 1000
+        await live_metrics.record(workspace_id, latency_ms, 0, False)
         
         # Log the error
         usage_tracker = UsageTracker(db)
@@ -163,3 +266,85 @@ async def chat_completions(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Provider error: {str(e)}"
         )
+    
+    # The provider answered; nothing below may count against it or refund the request
+    if use_semantic_cache:
+        await semantic_cache.store(workspace_id, request, response)
+    
+    # Calculate latency
+    latency_ms = (time.time() - start_time) * 1000
+    
+    # Extract token counts from response
+    usage = response.get("usage", {})
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    total_tokens = usage.get("total_tokens", 0)
+    
+    cost_usd = price_table.cost(model, prompt_tokens, completion_tokens)
+    
+    # Update rate limiting and spend counters
+    await rate_limiter.increment_usage(str(api_key_id), total_tokens)
+    await spend_counters.settle(reservation, cost_usd)
+    await live_metrics.record(workspace_id, latency_ms, total_tokens, True)
+    metrics.incr("tokens_total", total_tokens)
+    
+    # Log the request
+    usage_tracker = UsageTracker(db)
+    usage_tracker.log_request(
+        workspace_id=workspace_id,
+        model_id=model.id,
+        api_key_id=api_key_id,
+        model_name=request.model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        latency_ms=latency_ms,
+        success=True,
+        cost_usd=cost_usd
+    )
+    
+    return response
+
+@router.post("/chat/completions:batch")
+async def chat_completions_batch(
+    http_request: Request,
+    key_context: KeyContext = Depends(verify_api_key),
+    db: Session = Depends(get_db)
+):
+    """Run a JSONL batch of chat completions and stream NDJSON results in completion order"""
+    workspace_id, api_key_id = key_context.workspace_id, key_context.key_id
+    
+    try:
+        items = BatchProcessor.parse(await http_request.body())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch is empty"
+        )
+    
+    # Fail fast when the key is already over its limits; items are checked again as they run
+    rate_limiter = RateLimiter()
+    can_proceed, error_info = await rate_limiter.check_rate_limit(
+        str(api_key_id), key_context.rpm, key_context.tpm, key_context.daily_cap
+    )
+    
+    if not can_proceed:
+        raise HTTPException(
+            status_code=error_info.get("status_code", status.HTTP_429_TOO_MANY_REQUESTS),
+            detail=error_info["error"],
+            headers={"Retry-After": str(error_info.get("retry_after", 60))}
+        )
+    
+    processor = BatchProcessor(db, key_context)
+    
+    async def generate_results():
+        async for result in processor.run(items):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(generate_results(), media_type="application/x-ndjson")
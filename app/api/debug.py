@@ -0,0 +1,47 @@
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.auth import get_operator
+from app.core.config import settings
+from app.core.events import worker_id
+from app.core.profiler import ProfilerBusy, collapsed, sampling_profiler, speedscope
+from app.schemas.auth import TokenData
+
+router = APIRouter(prefix="/admin/debug", tags=["debug"])
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: str = Query("collapsed"),
+    operator: TokenData = Depends(get_operator)
+):
+    """Sample every thread's stack in the worker serving this request and return a flamegraph file"""
+    # Stacks show every workspace's traffic, so this is for operators, not workspace admins
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}'; use one of: {', '.join(PROFILE_FORMATS)}"
+        )
+    
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    interval = interval_ms / 1000
+    try:
+        stacks = await sampling_profiler.profile(seconds, interval)
+    except ProfilerBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    # Each worker profiles only itself; the header says which one answered
+    name = f"{worker_id().replace(':', '-')}-{int(time.time())}"
+    headers = {"X-Served-By": worker_id()}
+    if format == "speedscope":
+        headers["Content-Disposition"] = f'attachment; filename="{name}.speedscope.json"'
+        return JSONResponse(speedscope(stacks, interval, seconds, name), headers=headers)
+    
+    headers["Content-Disposition"] = f'attachment; filename="{name}.collapsed.txt"'
+    return PlainTextResponse(collapsed(stacks), headers=headers)
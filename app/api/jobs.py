@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.core.rate_limit import RateLimiter
+from app.api.chat import verify_api_key
+from app.services.api_key_cache import KeyContext
+from app.schemas.job import JobCreate, JobResponse
+from app.services.job_queue import JobQueue, check_webhook_url
+
+router = APIRouter(prefix="/v1/jobs", tags=["jobs"])
+
+def _job_response(job: dict) -> JobResponse:
+    return JobResponse(
+        id=job["id"],
+        status=job["status"],
+        model=job["model"],
+        priority=job["priority"],
+        created_at=job["created_at"],
+        deadline_at=job["deadline_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=job["result"],
+        error=job["error"]
+    )
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    job_data: JobCreate,
+    key_context: KeyContext = Depends(verify_api_key)
+):
+    """Queue a chat completion and return its job id immediately"""
+    workspace_id, api_key_id = key_context.workspace_id, key_context.key_id
+    
+    can_proceed, error_info = await RateLimiter().check_rate_limit(
+        str(api_key_id), key_context.rpm, key_context.tpm, key_context.daily_cap
+    )
+    if not can_proceed:
+        raise HTTPException(
+            status_code=error_info.get("status_code", status.HTTP_429_TOO_MANY_REQUESTS),
+            detail=error_info["error"],
+            headers={"Retry-After": str(error_info.get("retry_after", 60))}
+        )
+    
+    webhook_url = str(job_data.webhook_url) if job_data.webhook_url else None
+    if webhook_url:
+        try:
+            await check_webhook_url(webhook_url)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    job = await JobQueue().submit(
+        workspace_id=workspace_id,
+        api_key_id=api_key_id,
+        request=job_data.request,
+        priority=job_data.priority,
+        deadline_seconds=job_data.deadline_seconds,
+        webhook_url=webhook_url
+    )
+    
+    return _job_response(job)
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    key_context: KeyContext = Depends(verify_api_key)
+):
+    """Poll a job's status and result"""
+    workspace_id = key_context.workspace_id
+    
+    job = await JobQueue().get(job_id)
+    if not job or job["workspace_id"] != workspace_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return _job_response(job)
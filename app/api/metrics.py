@@ -0,0 +1,72 @@
+import asyncio
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.api.auth import create_stream_ticket, get_operator, get_stream_token_data, get_token_data
+from app.core.config import settings
+from app.core.db import get_db, pool_status, release_connection
+from app.core.events import worker_id
+from app.core.lifecycle import drain_state
+from app.core.metrics import aggregate_metrics
+from app.schemas.auth import TokenData
+from app.services.live_metrics import live_metrics
+
+router = APIRouter(prefix="/admin/metrics", tags=["metrics"])
+
+@router.get("")
+async def get_metrics(
+    operator: TokenData = Depends(get_operator)
+):
+    """Request and upstream counters summed across every live worker"""
+    # Cluster-wide numbers cover every workspace, so only operators see them
+    return dict(await aggregate_metrics(), served_by=worker_id(), db_pool=pool_status())
+
+@router.post("/live/ticket")
+async def create_live_metrics_ticket(
+    token_data: TokenData = Depends(get_token_data)
+):
+    """A short-lived ticket for opening the live stream, so the session token never goes in a URL"""
+    if not token_data.workspace_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid token: missing workspace or role"
+        )
+    
+    return {"ticket": create_stream_ticket(token_data), "expires_in": settings.LIVE_METRICS_TICKET_SECONDS}
+
+@router.get("/live")
+async def stream_live_metrics(
+    request: Request,
+    token_data: TokenData = Depends(get_stream_token_data),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events with the workspace's sliding-window counters, pushed every LIVE_METRICS_INTERVAL"""
+    if not token_data.workspace_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid token: missing workspace or role"
+        )
+    workspace_id = token_data.workspace_id
+    session_expires_at = token_data.exp
+    # The auth check may have opened a session; the stream must not hold its connection
+    release_connection(db)
+    
+    async def generate_events():
+        yield f"retry: {int(settings.LIVE_METRICS_INTERVAL * 3000)}\n\n"
+        # Ends on shutdown so the drain isn't held up by open dashboards, and once the session that
+        # asked for the ticket has expired; the dashboard then fetches a new ticket and reconnects
+        while not drain_state.draining and not await request.is_disconnected():
+            if session_expires_at is not None and time.time() >= session_expires_at:
+                break
+            try:
+                yield live_metrics.event(await live_metrics.snapshot(workspace_id))
+            except Exception:
+                yield ": metrics unavailable\n\n"
+            await asyncio.sleep(settings.LIVE_METRICS_INTERVAL)
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,20 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+import time
+from typing import List, Optional
+from app.core.config import settings
 from app.core.db import get_db
+from app.core.events import event_bus
 from app.api.auth import get_current_user_with_workspace
-from app.schemas.provider import ProviderCreate, ProviderUpdate, ProviderResponse, ProviderTest
+from app.schemas.provider import (
+    ProviderCreate, ProviderUpdate, ProviderResponse, ProviderTest,
+    ProviderTestAll, ProviderTestAllResponse
+)
+from app.services.admission import admission_scheduler
 from app.services.provider_manager import ProviderManager
+from app.services.routing import prefix_router
 
 router = APIRouter(prefix="/admin/providers", tags=["providers"])
 
 @router.post("/", response_model=ProviderResponse)
 def create_provider(
     provider_data: ProviderCreate,
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """Create a new provider"""
+    current_user, workspace_id, role = auth_context
     if role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -22,7 +31,14 @@ def create_provider(
         )
     
     provider_manager = ProviderManager(db)
-    provider = provider_manager.create_provider(provider_data, workspace_id)
+    try:
+        provider = provider_manager.create_provider(provider_data, workspace_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid provider config: {str(e)}"
+        )
+    event_bus.publish("catalog", workspace_id=workspace_id)
     
     return ProviderResponse(
         id=provider.id,
@@ -39,10 +55,11 @@ def create_provider(
 
 @router.get("/", response_model=List[ProviderResponse])
 def list_providers(
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """List all providers for the workspace"""
+    current_user, workspace_id, role = auth_context
     provider_manager = ProviderManager(db)
     providers = provider_manager.get_providers(workspace_id)
     
@@ -62,13 +79,60 @@ def list_providers(
         for provider in providers
     ]
 
+@router.get("/routing/stats")
+def get_routing_stats(
+    auth_context: tuple = Depends(get_current_user_with_workspace),
+    db: Session = Depends(get_db)
+):
+    """Prefix-affinity routing and admission stats for the workspace's providers"""
+    current_user, workspace_id, role = auth_context
+    
+    provider_manager = ProviderManager(db)
+    provider_ids = {provider.id for provider in provider_manager.get_providers(workspace_id)}
+    routing_stats = prefix_router.stats()
+    admission_stats = admission_scheduler.snapshot()
+    
+    return {
+        "providers": {
+            provider_id: {
+                "routing": routing_stats.get(provider_id),
+                "admission": admission_stats.get(provider_id)
+            }
+            for provider_id in provider_ids
+        }
+    }
+
+@router.post("/test-all", response_model=ProviderTestAllResponse)
+async def test_all_providers(
+    options: Optional[ProviderTestAll] = None,
+    auth_context: tuple = Depends(get_current_user_with_workspace),
+    db: Session = Depends(get_db)
+):
+    """Probe every provider in the workspace concurrently and report latency percentiles"""
+    current_user, workspace_id, role = auth_context
+    options = options or ProviderTestAll()
+    
+    start_time = time.perf_counter()
+    provider_manager = ProviderManager(db)
+    results = await provider_manager.test_providers(
+        workspace_id,
+        samples=options.samples or settings.PROVIDER_TEST_SAMPLES,
+        deadline_seconds=options.deadline_seconds or settings.PROVIDER_TEST_DEADLINE
+    )
+    
+    return ProviderTestAllResponse(
+        results=results,
+        elapsed_ms=round((time.perf_counter() - start_time) * 1000, 2)
+    )
+
 @router.get("/{provider_id}", response_model=ProviderResponse)
 def get_provider(
     provider_id: int,
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """Get a specific provider"""
+    current_user, workspace_id, role = auth_context
     provider_manager = ProviderManager(db)
     provider = provider_manager.get_provider(provider_id, workspace_id)
     
@@ -95,10 +159,11 @@ def get_provider(
 def update_provider(
     provider_id: int,
     provider_data: ProviderUpdate,
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """Update a provider"""
+    current_user, workspace_id, role = auth_context
     if role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -106,13 +171,20 @@ def update_provider(
         )
     
     provider_manager = ProviderManager(db)
-    provider = provider_manager.update_provider(provider_id, provider_data, workspace_id)
+    try:
+        provider = provider_manager.update_provider(provider_id, provider_data, workspace_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid provider config: {str(e)}"
+        )
     
     if not provider:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Provider not found"
         )
+    event_bus.publish("catalog", workspace_id=workspace_id)
     
     return ProviderResponse(
         id=provider.id,
@@ -130,10 +202,11 @@ def update_provider(
 @router.delete("/{provider_id}")
 def delete_provider(
     provider_id: int,
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """Delete a provider"""
+    current_user, workspace_id, role = auth_context
     if role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -148,17 +221,19 @@ def delete_provider(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Provider not found"
         )
+    event_bus.publish("catalog", workspace_id=workspace_id)
     
     return {"message": "Provider deleted successfully"}
 
 @router.post("/{provider_id}/test", response_model=ProviderTest)
-def test_provider(
+async def test_provider(
     provider_id: int,
-    current_user, workspace_id, role = Depends(get_current_user_with_workspace),
+    auth_context: tuple = Depends(get_current_user_with_workspace),
     db: Session = Depends(get_db)
 ):
     """Test provider connectivity"""
+    current_user, workspace_id, role = auth_context
     provider_manager = ProviderManager(db)
-    result = provider_manager.test_provider(provider_id, workspace_id)
+    result = await provider_manager.test_provider(provider_id, workspace_id)
     
     return ProviderTest(**result)
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.api.auth import get_current_user_with_workspace
+from app.core.db import get_db, release_connection
+from app.core.events import event_bus
+from app.core.rate_limit import CountersUnavailable
+from app.models.apikey import APIKey
+from app.models.workspace import Workspace
+from app.schemas.usage import Budget
+from app.services.log_export import DEFAULT_COMPRESSION, FORMATS, ExportUnavailable, export_logs
+from app.services.pricing import spend_counters
+
+router = APIRouter(prefix="/admin/usage", tags=["usage"])
+
+def _require_admin(role: str, action: str):
+    if role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Only admins can {action}"
+        )
+
+@router.get("/spend")
+async def get_spend(
+    auth_context: tuple = Depends(get_current_user_with_workspace),
+    db: Session = Depends(get_db)
+):
+    """Live spend for the current UTC day and month, for the workspace and each of its API keys"""
+    current_user, workspace_id, role = auth_context
+    _require_admin(role, "view spend")
+    
+    workspace = db.query(Workspace.daily_budget_usd, Workspace.monthly_budget_usd).filter(
+        Workspace.id == workspace_id
+    ).first()
+    api_keys = db.query(
+        APIKey.id, APIKey.name, APIKey.key_prefix, APIKey.daily_budget_usd, APIKey.monthly_budget_usd
+    ).filter(
+        APIKey.workspace_id == workspace_id
+    ).all()
+    release_connection(db)
+    
+    try:
+        spend = await spend_counters.get(workspace_id, [api_key.id for api_key in api_keys])
+    except CountersUnavailable as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    spend["workspace"]["budget"] = Budget(
+        daily_budget_usd=workspace.daily_budget_usd if workspace else None,
+        monthly_budget_usd=workspace.monthly_budget_usd if workspace else None
+    ).dict()
+    spend["keys"] = [
+        dict(
+            spend["keys"][api_key.id],
+            api_key_id=api_key.id,
+            name=api_key.name,
+            key_prefix=api_key.key_prefix,
+            budget=Budget(
+                daily_budget_usd=api_key.daily_budget_usd,
+                monthly_budget_usd=api_key.monthly_budget_usd
+            ).dict()
+        )
+        for api_key in api_keys
+    ]
+    return spend
+
+@router.put("/budget", response_model=Budget)
+def set_workspace_budget(
+    budget: Budget,
+    auth_context: tuple = Depends(get_current_user_with_workspace),
+    db: Session = Depends(get_db)
+):
+    """Set the workspace's daily and monthly spend caps"""
+    current_user, workspace_id, role = auth_context
+    _require_admin(role, "set budgets")
+    
+    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    if not workspace:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Workspace not found"
+        )
+    
+    workspace.daily_budget_usd = budget.daily_budget_usd
+    workspace.monthly_budget_usd = budget.monthly_budget_usd
+    db.commit()
+    # Every cached key context carries its workspace's budget
+    event_bus.publish("api_key")
+    
+    return budget
+
+@router.put("/keys/{key_id}/budget", response_model=Budget)
+def set_key_budget(
+    key_id: int,
+    budget: Budget,
+    auth_context: tuple = Depends(get_current_user_with_workspace),
+    db: Session = Depends(get_db)
+):
+    """Set an API key's daily and monthly spend caps"""
+    current_user, workspace_id, role = auth_context
+    _require_admin(role, "set budgets")
+    
+    api_key = db.query(APIKey).filter(
+        APIKey.id == key_id,
+        APIKey.workspace_id == workspace_id
+    ).first()
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    
+    api_key.daily_budget_usd = budget.daily_budget_usd
+    api_key.monthly_budget_usd = budget.monthly_budget_usd
+    db.commit()
+    event_bus.publish("api_key", key_id=key_id)
+    
+    return budget
+
+@router.get("/export")
+def export_request_logs(
+    format: str = Query("csv", pattern="^(csv|parquet|arrow)$"),
+    compression: Optional[str] = Query(None, pattern="^(none|gzip|zstd)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    auth_context: tuple = Depends(get_current_user_with_workspace)
+):
+    """Stream the workspace's request logs, optionally limited to [start, end)"""
+    current_user, workspace_id, role = auth_context
+    _require_admin(role, "export request logs")
+    compression = compression or DEFAULT_COMPRESSION[format]
+    
+    try:
+        body = export_logs(workspace_id, format, compression, start, end)
+    except ExportUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    filename = f"request_logs_{workspace_id}.{format}"
+    if format == "csv" and compression != "none":
+        filename += ".gz" if compression == "gzip" else ".zst"
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Dict
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one upstream provider"""
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+    
+    @property
+    def state(self) -> str:
+        # After the cool-down one trial request is let through to probe recovery
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+    
+    def record_success(self):
+        self.failures = 0
+        self._state = CLOSED
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = OPEN
+            self.opened_at = time.monotonic()
+    
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+class CircuitBreakers:
+    """Per-provider breakers, created on first use"""
+    
+    def __init__(self):
+        self._breakers: Dict[int, CircuitBreaker] = {}
+    
+    def get(self, provider_id: int) -> CircuitBreaker:
+        breaker = self._breakers.get(provider_id)
+        if breaker is None:
+            breaker = self._breakers[provider_id] = CircuitBreaker(
+                settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_TIMEOUT
+            )
+        return breaker
+    
+    def is_open(self, provider_id: int) -> bool:
+        breaker = self._breakers.get(provider_id)
+        return breaker is not None and breaker.is_open()
+    
+    def snapshot(self) -> Dict[int, Dict[str, Any]]:
+        return {
+            provider_id: {"state": breaker.state, "consecutive_failures": breaker.failures}
+            for provider_id, breaker in self._breakers.items()
+        }
+
+circuit_breakers = CircuitBreakers()
@@ -1,17 +1,105 @@
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
+from app.core.metrics import metrics
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+    
+    max_wait = 0.0
+    
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.incr("db_pool_timeouts")
+            raise
+        finally:
+            wait = time.perf_counter() - start_time
+            metrics.observe("db_pool_checkout_wait", wait)
+            InstrumentedQueuePool.max_wait = max(InstrumentedQueuePool.max_wait, wait)
+
+def _pool_limits() -> Tuple[int, int]:
+    """Per-worker pool size and overflow; unset values split DB_MAX_CONNECTIONS evenly across this node's workers"""
+    workers = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    share = max(settings.DB_MAX_CONNECTIONS // workers, 2)
+    pool_size = settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else max(share * 2 // 3, 1)
+    max_overflow = settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else max(share - pool_size, 0)
+    return pool_size, max_overflow
+
+POOL_SIZE, MAX_OVERFLOW = _pool_limits()
+
+def _engine_options() -> Dict[str, Any]:
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        return {}
+    
+    options: Dict[str, Any] = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS and SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options())
+# Loaded rows stay usable after a commit hands the connection back to the pool
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
+def pool_status() -> Dict[str, Any]:
+    """Current pool usage; saturation is checked-out connections over the pool's hard limit"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    
+    capacity = pool.size() + max(MAX_OVERFLOW, 0)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "capacity": capacity,
+        "saturation": round(pool.checkedout() / capacity, 4) if capacity else None,
+        "max_checkout_wait_ms": round(InstrumentedQueuePool.max_wait * 1000, 2)
+    }
+
+class LazySession:
+    """Session proxy that creates the real session on first use, so requests that never query cost nothing"""
+    
+    def __init__(self):
+        self._session: Optional[Session] = None
+    
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = SessionLocal()
+        return getattr(self._session, name)
+    
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+def release_connection(db: Session):
+    """End the current transaction so the pooled connection isn't held across a slow await"""
+    if isinstance(db, LazySession) and db._session is None:
+        return
+    db.commit()
+
 def get_db():
-    db = SessionLocal()
+    db = LazySession()
     try:
         yield db
     finally:
@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.rate_limit import redis_client
+
+logger = logging.getLogger(__name__)
+
+_worker_id: Optional[str] = None
+_worker_pid: Optional[int] = None
+
+def worker_id() -> str:
+    """Identifies this process so it can ignore its own broadcasts; regenerated after a fork"""
+    global _worker_id, _worker_pid
+    if _worker_pid != os.getpid():
+        _worker_pid = os.getpid()
+        _worker_id = f"{socket.gethostname()}:{_worker_pid}:{uuid.uuid4().hex[:6]}"
+    return _worker_id
+
+Handler = Callable[[Dict[str, Any]], None]
+
+class EventBus:
+    """Fans cache invalidations out to every worker process over Redis pub/sub"""
+    
+    def __init__(self, channel: Optional[str] = None):
+        self.channel = channel or settings.EVENTS_CHANNEL
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sends: Set[concurrent.futures.Future] = set()
+    
+    def subscribe(self, topic: str, handler: Handler):
+        """Register a handler; an empty payload means "drop everything for this topic" """
+        self._handlers.setdefault(topic, []).append(handler)
+    
+    def publish(self, topic: str, **payload: Any):
+        """Apply an event in this process, then broadcast it to the others"""
+        self._dispatch(topic, payload)
+        if self._loop is None or self._loop.is_closed():
+            return
+        
+        message = json.dumps({"topic": topic, "origin": worker_id(), "payload": payload})
+        # Publishers include sync routes running in the threadpool, so the send is handed to the event loop
+        send = asyncio.run_coroutine_threadsafe(self._broadcast(topic, message), self._loop)
+        self._sends.add(send)
+        send.add_done_callback(self._sends.discard)
+    
+    async def _broadcast(self, topic: str, message: str):
+        try:
+            await redis_client.publish(self.channel, message)
+        except Exception:
+            # Other workers still converge once their cache TTLs expire
+            logger.warning("Failed to broadcast %s event", topic)
+    
+    def _dispatch(self, topic: str, payload: Dict[str, Any]):
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Event handler for %s failed", topic)
+    
+    def start(self):
+        """Start listening for other workers' events on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        if self._sends:
+            await asyncio.wait([asyncio.wrap_future(send) for send in list(self._sends)], timeout=1)
+        self._loop = None
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    async def _listen(self):
+        connected_before = False
+        while True:
+            client = aioredis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if connected_before:
+                    # Events may have been missed while disconnected
+                    for topic in list(self._handlers):
+                        self._dispatch(topic, {})
+                connected_before = True
+                
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event.get("origin") == worker_id():
+                        continue
+                    self._dispatch(event["topic"], event.get("payload") or {})
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Event bus connection lost, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+                await client.close()
+
+event_bus = EventBus()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import text
+from app.core.circuit_breaker import OPEN, circuit_breakers
+from app.core.config import settings
+from app.core.db import engine, pool_status
+from app.core.rate_limit import redis_client
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+
+def _check_db() -> Dict[str, Any]:
+    # Includes pool checkout wait, so a saturated pool shows up as latency
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return {"pool": pool_status()}
+
+async def _check_redis() -> Dict[str, Any]:
+    await redis_client.ping()
+    return {}
+
+class HealthMonitor:
+    """Checks dependencies in the background so readiness probes only read cached results"""
+    
+    def __init__(self):
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._checked_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the check loop on the running event loop"""
+        self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    async def _loop(self):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Health check failed")
+            await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+    
+    async def check(self):
+        db, redis = await asyncio.gather(
+            self._timed("db", lambda: asyncio.to_thread(_check_db), settings.HEALTH_DB_BUDGET_MS),
+            self._timed("redis", _check_redis, settings.HEALTH_REDIS_BUDGET_MS)
+        )
+        self._results = {"db": db, "redis": redis, "providers": self._check_providers()}
+        self._checked_at = time.time()
+    
+    async def _timed(self, name: str, check: Callable[[], Awaitable[Dict[str, Any]]], budget_ms: float) -> Dict[str, Any]:
+        """Run a check with a timeout and grade its latency against a budget"""
+        pending = self._pending.get(name)
+        if pending is not None and not pending.done():
+            # The previous check is still hung; don't pile up calls behind it
+            return {"status": DOWN, "error": "Previous check has not returned"}
+        
+        start_time = time.perf_counter()
+        future = self._pending[name] = asyncio.ensure_future(check())
+        try:
+            details = await asyncio.wait_for(asyncio.shield(future), settings.HEALTH_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {"status": DOWN, "error": "Timed out"}
+        except Exception as e:
+            return {"status": DOWN, "error": str(e)}
+        
+        latency_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        return dict(details, status=OK if latency_ms <= budget_ms else DEGRADED, latency_ms=latency_ms)
+    
+    def _check_providers(self) -> Dict[str, Any]:
+        # Provider failures affect every node alike, so they are reported but don't fail readiness
+        breakers = circuit_breakers.snapshot()
+        open_ids = [provider_id for provider_id, breaker in breakers.items() if breaker["state"] == OPEN]
+        return {"status": DEGRADED if open_ids else OK, "open_circuits": open_ids, "circuits": breakers}
+    
+    def report(self) -> Dict[str, Any]:
+        """Latest cached results; stale results count as down"""
+        age = time.time() - self._checked_at
+        if not self._results or age > settings.HEALTH_CHECK_INTERVAL * 3 + settings.HEALTH_CHECK_TIMEOUT:
+            return {"ready": False, "checked_at": self._checked_at or None, "checks": {}, "error": "No recent health check"}
+        
+        # Postgres and Redis are shared by every node, so a slow one would fail them all at once
+        # and flap; over-budget is reported but only fails readiness when opted in
+        failing = (DOWN, DEGRADED) if settings.HEALTH_FAIL_ON_DEGRADED else (DOWN,)
+        ready = all(self._results[name]["status"] not in failing for name in ("db", "redis"))
+        return {"ready": ready, "checked_at": self._checked_at, "checks": self._results}
+
+health_monitor = HealthMonitor()
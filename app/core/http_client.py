@@ -0,0 +1,28 @@
+from typing import Optional
+import httpx
+from app.core.config import settings
+from app.core.tracing import trace_upstream_request
+
+# Shared pooled client for upstream calls that don't need their own lifecycle
+_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the process-wide async HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT),
+            event_hooks={"request": [trace_upstream_request]}
+        )
+    return _client
+
+async def close_http_client():
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
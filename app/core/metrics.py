@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.events import worker_id
+from app.core.rate_limit import background_redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY_PREFIX = "metrics:worker:"
+# Gauges are published under this field prefix so the aggregate takes their max instead of summing them
+GAUGE_FIELD_PREFIX = "gauge:"
+
+class WorkerMetrics:
+    """In-process counters, periodically published to Redis so any worker can report cluster totals"""
+    
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+    
+    def incr(self, name: str, value: float = 1):
+        self._counters[name] += value
+    
+    def set(self, name: str, value: float):
+        self._gauges[name] = value
+    
+    def observe(self, name: str, seconds: float):
+        self._counters[f"{name}_count"] += 1
+        self._counters[f"{name}_seconds_sum"] += seconds
+    
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self._counters, **{f"{GAUGE_FIELD_PREFIX}{name}": value for name, value in self._gauges.items()})
+    
+    def start(self):
+        """Start flushing this worker's counters on the running event loop"""
+        self._started_at = time.time()
+        self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+    
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+            await self.flush()
+    
+    async def flush(self):
+        key = f"{METRICS_KEY_PREFIX}{worker_id()}"
+        try:
+            pipe = background_redis_client.pipeline()
+            pipe.hset(key, mapping=dict(self.snapshot(), started_at=self._started_at))
+            # A worker that dies stops refreshing its entry and drops out of the totals
+            pipe.expire(key, max(1, int(settings.METRICS_FLUSH_INTERVAL * 3)))
+            await pipe.execute()
+        except Exception:
+            logger.warning("Failed to flush worker metrics")
+
+async def aggregate_metrics() -> Dict[str, Any]:
+    """Sum the latest counters published by every live worker; gauges report the highest worker's value"""
+    keys = [key async for key in background_redis_client.scan_iter(match=f"{METRICS_KEY_PREFIX}*", count=100)]
+    pipe = background_redis_client.pipeline()
+    for key in keys:
+        pipe.hgetall(key)
+    
+    totals: Dict[str, float] = defaultdict(float)
+    workers: Dict[str, Dict[str, float]] = {}
+    for key, values in zip(keys, await pipe.execute() if keys else []):
+        if not values:
+            continue
+        counters = {}
+        for name, value in values.items():
+            name, value = name.decode(), float(value)
+            if name.startswith(GAUGE_FIELD_PREFIX):
+                name = name[len(GAUGE_FIELD_PREFIX):]
+                totals[name] = max(totals.get(name, value), value)
+            elif name != "started_at":
+                totals[name] += value
+            counters[name] = value
+        workers[key.decode()[len(METRICS_KEY_PREFIX):]] = counters
+    
+    return {"workers": len(workers), "totals": dict(totals), "per_worker": workers}
+
+metrics = WorkerMetrics()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[str, str, int]
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ProfilerBusy(Exception):
+    """Raised when this worker is already running a profile"""
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    return code.co_name, filename, code.co_firstlineno
+
+def _sample_stacks(duration: float, interval: float) -> Counter:
+    """Sample every other thread's stack until the duration is up; counts are keyed by root-first stacks"""
+    own_id = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame))
+                frame = frame.f_back
+            stack.append((names.get(thread_id) or f"thread-{thread_id}", "", 0))
+            stacks[tuple(reversed(stack))] += 1
+        time.sleep(interval)
+    return stacks
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed-stack format, as read by flamegraph.pl, speedscope and most flamegraph tools"""
+    lines = []
+    for stack, count in stacks.items():
+        names = [name if not filename else f"{name} ({filename}:{line})" for name, filename, line in stack]
+        lines.append(f"{';'.join(name.replace(';', ':') for name in names)} {count}")
+    return "\n".join(sorted(lines)) + "\n"
+
+def speedscope(stacks: Counter, interval: float, duration: float, name: str) -> Dict[str, Any]:
+    """A speedscope file with one sampled profile per thread"""
+    frames: Dict[Frame, int] = {}
+    by_thread: Dict[str, Dict[str, list]] = {}
+    for stack, count in stacks.items():
+        thread_name, frame_stack = stack[0][0], stack[1:]
+        profile = by_thread.setdefault(thread_name, {"samples": [], "weights": []})
+        profile["samples"].append([frames.setdefault(frame, len(frames)) for frame in frame_stack])
+        profile["weights"].append(round(count * interval, 6))
+    
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": settings.APP_NAME,
+        "shared": {"frames": [{"name": fn, "file": filename, "line": line} for fn, filename, line in frames]},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": profile["samples"],
+                "weights": profile["weights"],
+            }
+            for thread_name, profile in by_thread.items()
+        ],
+    }
+
+class SamplingProfiler:
+    """Samples all thread stacks from a helper thread, so the event loop keeps serving while profiled"""
+    
+    def __init__(self):
+        self._running = False
+    
+    async def profile(self, seconds: float, interval: float) -> Counter:
+        if self._running:
+            raise ProfilerBusy("A profile is already running on this worker")
+        self._running = True
+        try:
+            return await asyncio.to_thread(_sample_stacks, seconds, interval)
+        finally:
+            self._running = False
+
+sampling_profiler = SamplingProfiler()
+
+class LoopLagMonitor:
+    """Measures event loop lag, and logs the loop thread's stack whenever a callback blocks it too long"""
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+    
+    def start(self):
+        """Start the heartbeat on the running event loop and the watchdog thread that checks it"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+        self._task = self._watchdog = None
+    
+    async def _beat(self):
+        interval = settings.LOOP_LAG_INTERVAL
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            # Anything past the expected wake-up is time the loop spent running other callbacks
+            lag = max(time.monotonic() - expected, 0.0)
+            metrics.observe("event_loop_lag", lag)
+            self._last_beat = time.monotonic()
+    
+    def _watch(self):
+        threshold = settings.LOOP_SLOW_CALLBACK_MS / 1000
+        reported_beat = None
+        while not self._stopped.wait(threshold / 2):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - settings.LOOP_LAG_INTERVAL
+            # One report per stall, taken while the blocking call is still on the stack
+            if stalled < threshold or last_beat == reported_beat:
+                continue
+            reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            metrics.incr("event_loop_stalls")
+            logger.warning(
+                "Event loop blocked for over %.0f ms; loop thread stack:\n%s",
+                stalled * 1000,
+                "".join(traceback.format_stack(frame))
+            )
+
+loop_lag_monitor = LoopLagMonitor()
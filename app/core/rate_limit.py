@@ -1,73 +1,134 @@
-import redis
+import logging
 import time
-from typing import Optional, Tuple
+from typing import Tuple
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 from app.core.config import settings
+from app.core.tracing import span
 
-redis_client = redis.from_url(settings.REDIS_URL)
+logger = logging.getLogger(__name__)
+
+# Socket timeouts bound every call, so a slow Redis costs a request at most REDIS_TIMEOUT
+redis_client = redis.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_TIMEOUT,
+    health_check_interval=30
+)
+
+# The job queue, metrics publishing and model sync aren't on a request's critical path, and run
+# scripts and scans that can outlast REDIS_TIMEOUT, so they get their own pool
+background_redis_client = redis.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_BACKGROUND_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_BACKGROUND_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_BACKGROUND_TIMEOUT,
+    health_check_interval=30
+)
+
+class CountersUnavailable(Exception):
+    """Raised when usage counters can't be read from Redis"""
+    
+    def __init__(self, detail: str = "Usage counters are unavailable; try again shortly", retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = 503
+        self.detail = detail
+        self.retry_after = retry_after
 
 class RateLimiter:
     def __init__(self):
         self.redis = redis_client
     
-    def check_rate_limit(self, key_id: str, rpm: int, tpm: int, daily_cap: int) -> Tuple[bool, dict]:
-        """Check if request is within rate limits"""
+    @staticmethod
+    def _keys(key_id: str) -> Tuple[str, str, str, int]:
         now = int(time.time())
         current_hour = now - (now % 3600)
         current_day = now - (now % 86400)
+        return (
+            f"rpm:{key_id}:{current_hour}",
+            f"tpm:{key_id}:{current_hour}",
+            f"daily:{key_id}:{current_day}",
+            now
+        )
+    
+    async def check_rate_limit(self, key_id: str, rpm: int, tpm: int, daily_cap: int) -> Tuple[bool, dict]:
+        """Check if request is within rate limits"""
+        rpm_key, tpm_key, daily_key, now = self._keys(key_id)
+        
+        # One round trip for all three counters
+        try:
+            with span("rate_limit.check"):
+                current_rpm, current_tpm, current_daily = await self.redis.mget(rpm_key, tpm_key, daily_key)
+        except (RedisError, OSError) as e:
+            if settings.REDIS_FAIL_OPEN:
+                logger.warning("Rate limiter unavailable, allowing request: %s", e)
+                return True, {}
+            return False, {"error": "Rate limiter unavailable", "retry_after": 1, "status_code": 503}
         
         # Check RPM
-        rpm_key = f"rpm:{key_id}:{current_hour}"
-        current_rpm = self.redis.get(rpm_key)
         if current_rpm and int(current_rpm) >= rpm:
             return False, {"error": "Rate limit exceeded (RPM)", "retry_after": 3600 - (now % 3600)}
         
         # Check TPM
-        tpm_key = f"tpm:{key_id}:{current_hour}"
-        current_tpm = self.redis.get(tpm_key)
         if current_tpm and int(current_tpm) >= tpm:
             return False, {"error": "Rate limit exceeded (TPM)", "retry_after": 3600 - (now % 3600)}
         
         # Check daily cap
-        daily_key = f"daily:{key_id}:{current_day}"
-        current_daily = self.redis.get(daily_key)
         if current_daily and int(current_daily) >= daily_cap:
             return False, {"error": "Daily cap exceeded", "retry_after": 86400 - (now % 86400)}
         
         return True, {}
     
-    def increment_usage(self, key_id: str, tokens: int):
-        """Increment usage counters"""
+    async def check_login_attempt(self, client_ip: str) -> Tuple[bool, dict]:
+        """Count an auth attempt from this IP against the per-minute limit"""
         now = int(time.time())
-        current_hour = now - (now % 3600)
-        current_day = now - (now % 86400)
+        current_minute = now - (now % 60)
+        key = f"login:{client_ip}:{current_minute}"
         
-        # Increment RPM
-        rpm_key = f"rpm:{key_id}:{current_hour}"
-        self.redis.incr(rpm_key)
-        self.redis.expire(rpm_key, 3600)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.incr(key)
+        pipe.expire(key, 60)
+        try:
+            attempts, _ = await pipe.execute()
+        except (RedisError, OSError) as e:
+            if settings.REDIS_FAIL_OPEN:
+                logger.warning("Login throttle unavailable, allowing attempt: %s", e)
+                return True, {}
+            return False, {"error": "Login throttle unavailable", "retry_after": 1, "status_code": 503}
         
-        # Increment TPM
-        tpm_key = f"tpm:{key_id}:{current_hour}"
-        self.redis.incrby(tpm_key, tokens)
-        self.redis.expire(tpm_key, 3600)
+        if attempts > settings.LOGIN_ATTEMPTS_PER_MINUTE:
+            return False, {"error": "Too many login attempts", "retry_after": 60 - (now % 60)}
+        return True, {}
+    
+    async def increment_usage(self, key_id: str, tokens: int, requests: int = 1):
+        """Increment usage counters"""
+        rpm_key, tpm_key, daily_key, _ = self._keys(key_id)
         
-        # Increment daily
-        daily_key = f"daily:{key_id}:{current_day}"
-        self.redis.incrby(daily_key, tokens)
-        self.redis.expire(daily_key, 86400)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.incrby(rpm_key, requests)
+        pipe.expire(rpm_key, 3600)
+        pipe.incrby(tpm_key, tokens)
+        pipe.expire(tpm_key, 3600)
+        pipe.incrby(daily_key, tokens)
+        pipe.expire(daily_key, 86400)
+        try:
+            with span("rate_limit.increment"):
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            # Counters are best effort; losing one increment beats failing a served request
+            logger.warning("Failed to record usage for key %s: %s", key_id, e)
     
-    def get_usage_stats(self, key_id: str) -> dict:
+    async def get_usage_stats(self, key_id: str) -> dict:
         """Get current usage statistics"""
-        now = int(time.time())
-        current_hour = now - (now % 3600)
-        current_day = now - (now % 86400)
-        
-        rpm_key = f"rpm:{key_id}:{current_hour}"
-        tpm_key = f"tpm:{key_id}:{current_hour}"
-        daily_key = f"daily:{key_id}:{current_day}"
+        rpm_key, tpm_key, daily_key, _ = self._keys(key_id)
+        try:
+            current_rpm, current_tpm, current_daily = await self.redis.mget(rpm_key, tpm_key, daily_key)
+        except (RedisError, OSError) as e:
+            raise CountersUnavailable() from e
         
         return {
-            "current_rpm": int(self.redis.get(rpm_key) or 0),
-            "current_tpm": int(self.redis.get(tpm_key) or 0),
-            "current_daily": int(self.redis.get(daily_key) or 0)
+            "current_rpm": int(current_rpm or 0),
+            "current_tpm": int(current_tpm or 0),
+            "current_daily": int(current_daily or 0)
         }
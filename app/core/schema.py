@@ -0,0 +1,64 @@
+import hashlib
+from typing import List
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, select
+from app.core.db import Base, engine
+
+# Kept off Base.metadata so it doesn't feed into its own fingerprint
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String, nullable=False)
+)
+
+class SchemaMismatch(RuntimeError):
+    """Raised when the database schema doesn't match the models this build expects"""
+
+def schema_fingerprint() -> str:
+    """Stable digest of every mapped table and column; only recorded once the live schema was checked against them"""
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name):
+        columns = ",".join(
+            f"{column.name}:{column.type}:{int(bool(column.nullable))}"
+            for column in sorted(table.columns, key=lambda column: column.name)
+        )
+        parts.append(f"{table.name}({columns})")
+    return hashlib.sha256(";".join(parts).encode()).hexdigest()[:16]
+
+def missing_columns() -> List[str]:
+    """Mapped columns the live database lacks; create_all adds missing tables but never alters existing ones"""
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        live = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in live)
+    return missing
+
+def ensure_schema():
+    """Create missing tables, check existing ones against the models and record the fingerprint (the slow path)"""
+    Base.metadata.create_all(bind=engine)
+    missing = missing_columns()
+    if missing:
+        raise SchemaMismatch(f"Database is missing columns {', '.join(missing)}; add them before upgrading")
+    
+    _version_metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(schema_version.delete())
+        connection.execute(schema_version.insert().values(id=1, fingerprint=schema_fingerprint()))
+
+def verify_schema():
+    """Check the recorded fingerprint with a single SELECT instead of issuing DDL"""
+    expected = schema_fingerprint()
+    try:
+        with engine.connect() as connection:
+            recorded = connection.execute(
+                select(schema_version.c.fingerprint).where(schema_version.c.id == 1)
+            ).scalar()
+    except Exception as e:
+        raise SchemaMismatch(f"Schema version is unreadable ({e}); run once without FAST_BOOT") from e
+    
+    if recorded != expected:
+        raise SchemaMismatch(
+            f"Schema fingerprint {recorded} does not match this build ({expected}); run once without FAST_BOOT"
+        )
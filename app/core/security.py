@@ -1,13 +1,18 @@
+import asyncio
+import importlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from cryptography.fernet import Fernet
+from functools import lru_cache
+from typing import Any, Callable, Optional, Union
 import base64
 from app.core.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# passlib/argon2, jose and cryptography are imported on first use to keep worker boot fast
+
+@lru_cache(maxsize=None)
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["argon2"], deprecated="auto")
 
 # Encryption
 def get_encryption_key():
@@ -17,13 +22,61 @@ def get_encryption_key():
         key = key.ljust(32, b'0')[:32]
     return base64.urlsafe_b64encode(key)
 
-fernet = Fernet(get_encryption_key())
+@lru_cache(maxsize=None)
+def _fernet():
+    from cryptography.fernet import Fernet
+    return Fernet(get_encryption_key())
+
+def warm_up():
+    """Load the lazy crypto dependencies ahead of the first request that needs them"""
+    _pwd_context().handler().get_backend()  # Loads argon2-cffi
+    _fernet()
+    importlib.import_module("jose.jwt")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+class PasswordPoolFull(Exception):
+    """Too many password hashes are already queued"""
+
+class PasswordHashPool:
+    """Runs argon2 on its own bounded threads, so auth bursts can't take the threadpool every sync route shares"""
+    
+    def __init__(self):
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        # Rejecting beats queueing: a login that waits longer than the client will is wasted CPU
+        if self.pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordPoolFull()
+        if self._executor is None:
+            # Created on first use, so each forked worker gets its own threads
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+        
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hash_pool = PasswordHashPool()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hash_pool.run(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,10 +85,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
@@ -44,8 +99,8 @@ def verify_token(token: str) -> Optional[dict]:
 
 def encrypt_secret(secret: str) -> str:
     """Encrypt sensitive data like API keys"""
-    return fernet.encrypt(secret.encode()).decode()
+    return _fernet().encrypt(secret.encode()).decode()
 
 def decrypt_secret(encrypted_secret: str) -> str:
     """Decrypt sensitive data like API keys"""
-    return fernet.decrypt(encrypted_secret.encode()).decode()
+    return _fernet().decrypt(encrypted_secret.encode()).decode()
@@ -0,0 +1,143 @@
+import contextlib
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Dict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# opentelemetry is optional; without it (or with tracing off) every span is a shared no-op
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:
+    trace = None
+
+_NOOP = contextlib.nullcontext()
+_tracer = None
+_provider = None
+# Trace ids are only sent to providers we run ourselves; third-party APIs never see them
+_propagate_upstream: ContextVar[bool] = ContextVar("propagate_upstream", default=False)
+
+# httpcore trace events kept on the upstream span: connection setup and time to first byte
+_UPSTREAM_EVENTS = {
+    "connection.connect_tcp.complete": "connected",
+    "connection.start_tls.complete": "tls_established",
+    "http11.receive_response_headers.complete": "first_byte",
+    "http2.receive_response_headers.complete": "first_byte",
+}
+
+def _exporter():
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    # One JSON span per line, so traces can be read without running a collector; one file per
+    # worker, since line-buffered appends from several processes can interleave
+    root, ext = os.path.splitext(settings.TRACING_FILE)
+    out = open(f"{root}.{os.getpid()}{ext}", "a", buffering=1)
+    return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+def setup_tracing():
+    """Install the tracer provider; a no-op unless TRACING_ENABLED and opentelemetry-sdk is installed"""
+    global _tracer, _provider
+    if not settings.TRACING_ENABLED or _tracer is not None:
+        return
+    if trace is None:
+        logger.warning("TRACING_ENABLED is set but opentelemetry is not installed; tracing is off")
+        return
+    
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        exporter = _exporter()
+    except ImportError as e:
+        logger.warning("Tracing exporter '%s' is unavailable, tracing is off: %s", settings.TRACING_EXPORTER, e)
+        return
+    
+    # Callers that already sampled a trace keep it; new traces are sampled at TRACING_SAMPLE_RATIO
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.APP_NAME, "service.version": settings.APP_VERSION}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer(__name__)
+
+def shutdown_tracing():
+    """Flush buffered spans"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+def span(name: str, **attributes: Any):
+    """Context manager timing one stage as a child of the current span"""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+@contextlib.contextmanager
+def upstream_propagation(provider):
+    """Send traceparent on upstream calls made in the block, if the provider's config marks it internal"""
+    token = _propagate_upstream.set(bool((provider.config or {}).get("internal")))
+    try:
+        yield
+    finally:
+        _propagate_upstream.reset(token)
+
+async def trace_upstream_request(request):
+    """httpx request hook: pass the trace context to internal providers and note connect/TTFB on the current span"""
+    if _tracer is None:
+        return
+    if _propagate_upstream.get():
+        propagate.inject(request.headers)
+    current = trace.get_current_span()
+    if not current.is_recording():
+        return
+    
+    async def on_event(event_name: str, info: Dict[str, Any]):
+        name = _UPSTREAM_EVENTS.get(event_name)
+        if name:
+            current.add_event(name)
+    
+    request.extensions["trace"] = on_event
+
+class TracingMiddleware:
+    """Starts a server span per HTTP request, continuing the caller's trace when it sends traceparent"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if _tracer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.method": method, "http.target": scope["path"]}
+        ) as server_span:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+            
+            await self.app(scope, receive, send_wrapper)
+            # Name by route template, not the raw path, to keep span names low-cardinality
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                server_span.update_name(f"{method} {route}")
@@ -1,19 +1,83 @@
-from fastapi import FastAPI, Depends
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.core.db import engine, Base
-from app.api import auth, providers, chat
+from app.core.db import engine
+from app.core.events import event_bus
+from app.core.health import health_monitor
+from app.core.http_client import close_http_client
+from app.core.lifecycle import DrainMiddleware, boot_timer, drain_state, install_drain_signal_handlers
+from app.core.metrics import metrics
+from app.core.profiler import loop_lag_monitor
+from app.core.rate_limit import background_redis_client, redis_client
+from app.core.schema import ensure_schema, verify_schema
+from app.core.security import password_hash_pool
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.api import auth, providers, chat, jobs, usage, debug, metrics as metrics_api
 from app.models import *  # Import all models
+from app.services.job_worker import JobWorker
+from app.services.model_sync import ModelSync
+from app.services.semantic_cache import semantic_cache
+from app.services.warmup import prewarm
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    boot_timer.mark("startup_begin")
+    setup_tracing()
+    if settings.FAST_BOOT:
+        # DDL already ran once (e.g. in the gunicorn master); just confirm it matches
+        verify_schema()
+    else:
+        ensure_schema()
+    event_bus.start()
+    metrics.start()
+    health_monitor.start()
+    if settings.LOOP_LAG_MONITOR_ENABLED:
+        loop_lag_monitor.start()
+    job_worker = JobWorker()
+    job_worker.start()
+    model_sync = ModelSync()
+    if settings.MODEL_SYNC_ENABLED:
+        model_sync.start()
+    install_drain_signal_handlers()
+    prewarm_task = asyncio.create_task(prewarm()) if settings.PREWARM_ENABLED else None
+    boot_timer.mark("ready")
     yield
-    # Shutdown
-    pass
+    # Shutdown: finish what is in flight before releasing connections
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SHUTDOWN_DRAIN_TIMEOUT
+    drain_state.begin()
+    if not await drain_state.wait_idle(settings.SHUTDOWN_DRAIN_TIMEOUT):
+        logger.warning("Drain deadline reached with %d requests in flight", drain_state.in_flight)
+    
+    if prewarm_task and not prewarm_task.done():
+        prewarm_task.cancel()
+    await model_sync.stop()
+    try:
+        # Unfinished jobs keep their lease and are requeued by another worker
+        await asyncio.wait_for(job_worker.stop(), max(deadline - loop.time(), 0.1))
+    except asyncio.TimeoutError:
+        logger.warning("Drain deadline reached with jobs still running")
+    semantic_cache.flush()
+    await health_monitor.stop()
+    await loop_lag_monitor.stop()
+    await metrics.stop()
+    await event_bus.stop()
+    
+    await close_http_client()
+    password_hash_pool.shutdown()
+    await redis_client.connection_pool.disconnect()
+    await background_redis_client.connection_pool.disconnect()
+    engine.dispose()
+    shutdown_tracing()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -36,10 +100,28 @@ app.add_middleware(
     allowed_hosts=["*"]  # Configure appropriately for production
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    metrics.observe("http_request", time.perf_counter() - start_time)
+    metrics.incr(f"http_responses_{response.status_code // 100}xx")
+    return response
+
+# Server spans cover the whole request, streamed body included
+app.add_middleware(TracingMiddleware)
+
+# Outermost, so requests rejected while draining do no other work
+app.add_middleware(DrainMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(providers.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(usage.router, prefix="/api")
+app.include_router(metrics_api.router, prefix="/api")
+app.include_router(debug.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -54,6 +136,22 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "BYOM AI Platform"}
 
+@app.get("/livez")
+async def liveness_check():
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    """Cached dependency health; never touches the dependencies itself"""
+    if drain_state.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    
+    report = health_monitor.report()
+    return JSONResponse(
+        dict(report, status="ready" if report["ready"] else "not_ready"),
+        status_code=200 if report["ready"] else 503
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
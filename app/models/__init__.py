@@ -2,7 +2,7 @@ from .workspace import Workspace
 from .user import User, AuthProvider
 from .provider import Provider, ProviderType
 from .model import Model
-from .apikey import APIKey, KeyStatus
+from .apikey import APIKey, KeyStatus, KeyPriority
 from .requestlog import RequestLog
 
 # Import the missing relationship model
@@ -32,5 +32,5 @@ class UserWorkspaceRole(Base):
 # Update the imports to include the new model
 __all__ = [
     "Workspace", "User", "AuthProvider", "Provider", "ProviderType",
-    "Model", "APIKey", "KeyStatus", "RequestLog", "UserWorkspaceRole", "UserRole"
+    "Model", "APIKey", "KeyStatus", "KeyPriority", "RequestLog", "UserWorkspaceRole", "UserRole"
 ]
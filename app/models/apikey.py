@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, Enum, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy import ForeignKey
@@ -10,6 +10,11 @@ class KeyStatus(str, enum.Enum):
     INACTIVE = "inactive"
     REVOKED = "revoked"
 
+class KeyPriority(str, enum.Enum):
+    HIGH = "high"  # Interactive traffic
+    NORMAL = "normal"
+    LOW = "low"  # Batch and background traffic
+
 class APIKey(Base):
     __tablename__ = "api_keys"
     
@@ -21,7 +26,10 @@ class APIKey(Base):
     rpm = Column(Integer, default=60)  # Requests per minute
     tpm = Column(Integer, default=10000)  # Tokens per minute
     daily_cap = Column(Integer, default=100000)  # Daily token cap
+    daily_budget_usd = Column(Float, nullable=True)  # Spend cap per UTC day; null for none
+    monthly_budget_usd = Column(Float, nullable=True)  # Spend cap per UTC month; null for none
     status = Column(Enum(KeyStatus), default=KeyStatus.ACTIVE)
+    priority = Column(Enum(KeyPriority), default=KeyPriority.NORMAL)  # Admission lane
     workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
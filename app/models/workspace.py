@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.db import Base
@@ -10,6 +10,8 @@ class Workspace(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
+    daily_budget_usd = Column(Float, nullable=True)  # Hard spend cap per UTC day; null for none
+    monthly_budget_usd = Column(Float, nullable=True)  # Hard spend cap per UTC month; null for none
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -32,3 +32,4 @@ class TokenData(BaseModel):
     user_id: Optional[int] = None
     workspace_id: Optional[int] = None
     role: Optional[str] = None
+    exp: Optional[int] = None
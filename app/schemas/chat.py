@@ -44,3 +44,15 @@ class UsageInfo(BaseModel):
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+
+class BatchRequestItem(BaseModel):
+    custom_id: Optional[str] = None
+    method: Optional[str] = "POST"
+    url: Optional[str] = "/v1/chat/completions"
+    body: ChatCompletionRequest
+
+class BatchResponseItem(BaseModel):
+    id: str
+    custom_id: Optional[str] = None
+    response: Optional[dict] = None
+    error: Optional[dict] = None
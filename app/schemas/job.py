@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Optional
+from datetime import datetime
+from app.schemas.chat import ChatCompletionRequest
+
+class JobCreate(BaseModel):
+    request: ChatCompletionRequest
+    priority: int = Field(default=5, ge=0, le=9)  # Higher runs first
+    deadline_seconds: Optional[int] = Field(default=None, ge=1)
+    webhook_url: Optional[HttpUrl] = None
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    model: str
+    priority: int
+    created_at: datetime
+    deadline_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
-from app.models.apikey import KeyStatus
+from app.models.apikey import KeyStatus, KeyPriority
 
 class APIKeyBase(BaseModel):
     name: str
@@ -9,6 +9,9 @@ class APIKeyBase(BaseModel):
     rpm: int = 60
     tpm: int = 10000
     daily_cap: int = 100000
+    daily_budget_usd: Optional[float] = Field(default=None, ge=0)
+    monthly_budget_usd: Optional[float] = Field(default=None, ge=0)
+    priority: KeyPriority = KeyPriority.NORMAL
 
 class APIKeyCreate(APIKeyBase):
     pass
@@ -19,6 +22,9 @@ class APIKeyUpdate(BaseModel):
     rpm: Optional[int] = None
     tpm: Optional[int] = None
     daily_cap: Optional[int] = None
+    daily_budget_usd: Optional[float] = Field(default=None, ge=0)
+    monthly_budget_usd: Optional[float] = Field(default=None, ge=0)
+    priority: Optional[KeyPriority] = None
     status: Optional[KeyStatus] = None
 
 class APIKeyResponse(APIKeyBase):
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from app.models.provider import ProviderType
 
@@ -35,3 +35,28 @@ class ProviderTest(BaseModel):
     message: str
     latency_ms: Optional[float] = None
     error: Optional[str] = None
+
+class ProviderTestAll(BaseModel):
+    samples: Optional[int] = Field(default=None, ge=1, le=20)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=60)
+
+class LatencyPercentiles(BaseModel):
+    min: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+class ProviderProbeResult(BaseModel):
+    provider_id: int
+    name: str
+    type: ProviderType
+    success: bool
+    samples: int
+    successes: int
+    latency_ms: Optional[LatencyPercentiles] = None
+    error: Optional[str] = None
+
+class ProviderTestAllResponse(BaseModel):
+    results: List[ProviderProbeResult]
+    elapsed_ms: float
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class Budget(BaseModel):
+    # USD per UTC day/month; null means no cap
+    daily_budget_usd: Optional[float] = Field(default=None, ge=0)
+    monthly_budget_usd: Optional[float] = Field(default=None, ge=0)
@@ -1,9 +1,12 @@
 import httpx
 import time
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
+from app.core.http_client import get_http_client
 from app.models.provider import Provider
 from app.schemas.chat import ChatCompletionRequest, ChatCompletionResponse
+from app.services.mapping import compile_mappings
+from app.services.stream_codec import ChunkEncoder, UpstreamStream
 
 class HTTPAdapter:
     def __init__(self, provider: Provider):
@@ -11,15 +14,16 @@ class HTTPAdapter:
         self.base_url = provider.base_url.rstrip('/')
         self.config = provider.config or {}
         self.headers = provider.headers or {}
+        # Mappings are compiled once per adapter, not per request
+        self.mappings = compile_mappings(self.config)
     
-    def health_check(self) -> Dict[str, Any]:
-        """Check if the custom HTTP endpoint is accessible"""
-        start_time = time.time()
+    async def async_health_check(self, timeout: float = 10) -> Dict[str, Any]:
+        """Check if the custom HTTP endpoint is accessible without blocking the event loop"""
+        start_time = time.perf_counter()
         try:
-            # Use the health check endpoint if configured, otherwise try the base URL
             health_url = self.config.get("health_endpoint", self.base_url)
-            response = httpx.get(health_url, headers=self.headers, timeout=10)
-            latency = (time.time() - start_time) * 1000
+            response = await get_http_client().get(health_url, headers=self.headers, timeout=timeout)
+            latency = (time.perf_counter() - start_time) * 1000
             
             if response.status_code == 200:
                 return {
@@ -42,156 +46,114 @@ class HTTPAdapter:
     
     async def chat_completion(self, request: ChatCompletionRequest, stream: bool = False) -> Any:
         """Send chat completion request to custom HTTP endpoint"""
-        # Get configuration for request mapping
-        request_config = self.config.get("request_mapping", {})
-        response_config = self.config.get("response_mapping", {})
+        request_mapping = self.mappings.request
         
         # Build the request payload according to configuration
-        payload = self._build_request_payload(request, request_config)
-        
-        # Determine the endpoint
-        endpoint = request_config.get("endpoint", "/chat/completions")
-        url = f"{self.base_url}{endpoint}"
+        payload = request_mapping.build(request)
+        url = f"{self.base_url}{request_mapping.endpoint}"
         
         # Prepare headers
         headers = {"Content-Type": "application/json"}
         headers.update(self.headers)
         
         # Add any custom headers from config
-        if "headers" in request_config:
-            headers.update(request_config["headers"])
+        headers.update(request_mapping.headers)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Custom endpoint error: {response.status_code} - {response.text}")
-            
-            if stream:
-                return response.aiter_bytes()
-            else:
-                return self._convert_response(response.json(), request.model, response_config)
-    
-    def _build_request_payload(self, request: ChatCompletionRequest, config: Dict[str, Any]) -> Dict[str, Any]:
-        """Build the request payload according to custom configuration"""
-        # Default OpenAI format
-        if not config:
-            return request.dict(exclude_unset=True)
+        if stream:
+            return await self._open_stream(url, headers, payload, request.model)
         
-        # Custom mapping
-        payload = {}
+        response = await get_http_client().post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=60
+        )
         
-        # Map messages
-        if "messages" in config:
-            message_mapping = config["messages"]
-            payload[message_mapping.get("field", "messages")] = [
-                {
-                    message_mapping.get("role_field", "role"): msg.role,
-                    message_mapping.get("content_field", "content"): msg.content
-                }
-                for msg in request.messages
-            ]
-        else:
-            payload["messages"] = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+        if response.status_code != 200:
+            raise Exception(f"Custom endpoint error: {response.status_code} - {response.text}")
         
-        # Map other fields
-        field_mappings = {
-            "model": "model",
-            "temperature": "temperature",
-            "max_tokens": "max_tokens",
-            "stream": "stream"
-        }
-        
-        for openai_field, custom_field in field_mappings.items():
-            if hasattr(request, openai_field) and getattr(request, openai_field) is not None:
-                payload[custom_field] = getattr(request, openai_field)
-        
-        # Add any additional fields from config
-        if "additional_fields" in config:
-            payload.update(config["additional_fields"])
-        
-        return payload
+        return self.mappings.response.convert(response.json(), request.model)
     
-    def _convert_response(self, response: Dict[str, Any], model: str, config: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert the custom response to OpenAI format"""
-        if not config:
-            # Try to detect if it's already in OpenAI format
-            if "choices" in response and "usage" in response:
-                return response
-        
-        # Custom response mapping
-        openai_response = {
-            "id": f"custom-{int(time.time())}",
-            "object": "chat.completion",
-            "created": int(time.time()),
-            "model": model,
-            "choices": [],
-            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-        }
-        
-        # Map choices
-        choices_field = config.get("choices_field", "choices")
-        if choices_field in response:
-            choices = response[choices_field]
-            if isinstance(choices, list):
-                for i, choice in enumerate(choices):
-                    message_field = config.get("message_field", "message")
-                    content_field = config.get("content_field", "content")
-                    
-                    if message_field in choice:
-                        message = choice[message_field]
-                        content = message.get(content_field, "") if isinstance(message, dict) else str(message)
-                        
-                        openai_response["choices"].append({
-                            "index": i,
-                            "message": {
-                                "role": "assistant",
-                                "content": content
-                            },
-                            "finish_reason": "stop"
-                        })
-        
-        # Map usage if available
-        usage_field = config.get("usage_field", "usage")
-        if usage_field in response:
-            usage = response[usage_field]
-            if isinstance(usage, dict):
-                openai_response["usage"] = {
-                    "prompt_tokens": usage.get("prompt_tokens", 0),
-                    "completion_tokens": usage.get("completion_tokens", 0),
-                    "total_tokens": usage.get("total_tokens", 0)
-                }
-        
-        return openai_response
+    async def _open_stream(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], model: str) -> UpstreamStream:
+        """Start a streamed request, raising before any bytes are sent on upstream errors"""
+        client = get_http_client()
+        response = await client.send(
+            client.build_request("POST", url, headers=headers, json=payload, timeout=httpx.Timeout(60, read=None)),
+            stream=True
+        )
+        
+        if response.status_code != 200:
+            body = await response.aread()
+            await response.aclose()
+            raise Exception(f"Custom endpoint error: {response.status_code} - {body.decode(errors='replace')}")
+        
+        return UpstreamStream(response, self._stream_chunks(response, model))
+    
+    async def _stream_chunks(self, response: httpx.Response, model: str) -> AsyncIterator[bytes]:
+        """Convert upstream chunks to OpenAI chat.completion.chunk events as they arrive"""
+        stream_mapping = self.mappings.stream
+        try:
+            if stream_mapping.passthrough:
+                async for data in response.aiter_bytes():
+                    yield data
+                return
+            
+            decoder = stream_mapping.create_decoder()
+            encoder = ChunkEncoder(model)
+            finish_reason = None
+            
+            def convert(chunks) -> List[bytes]:
+                nonlocal finish_reason
+                events = []
+                for chunk in chunks:
+                    content = stream_mapping.content(chunk)
+                    finish_reason = stream_mapping.finish_reason(chunk) or finish_reason
+                    events.extend(encoder.content(content or ""))
+                    if stream_mapping.is_done(chunk):
+                        decoder.done = True
+                return events
+            
+            async for data in response.aiter_bytes():
+                for event in convert(decoder.feed(data)):
+                    yield event
+                if decoder.done:
+                    break
+            else:
+                # The upstream ended; its last record may lack a terminator
+                for event in convert(decoder.close()):
+                    yield event
+            
+            for event in encoder.finish(finish_reason):
+                yield event
+        finally:
+            # Returns the connection to the shared pool
+            await response.aclose()
     
-    def get_models(self) -> Dict[str, Any]:
-        """Get available models from custom endpoint"""
+    async def list_models(self, timeout: float = 10) -> Dict[str, Any]:
+        """Get available models from custom endpoint without blocking the event loop"""
         models_endpoint = self.config.get("models_endpoint", "/models")
         url = f"{self.base_url}{models_endpoint}"
         
-        response = httpx.get(url, headers=self.headers, timeout=10)
+        response = await get_http_client().get(url, headers=self.headers, timeout=timeout)
         if response.status_code == 200:
-            models_data = response.json()
-            # Try to convert to OpenAI format
-            if "data" in models_data:
-                return models_data
-            elif isinstance(models_data, list):
-                models = []
-                for model in models_data:
-                    if isinstance(model, str):
-                        models.append({
-                            "id": model,
-                            "object": "model",
-                            "created": int(time.time()),
-                            "owned_by": "custom"
-                        })
-                return {"data": models}
-            else:
-                return {"data": []}
+            return self._convert_models(response.json())
         else:
             raise Exception(f"Failed to get models: {response.status_code}")
+    
+    def _convert_models(self, models_data: Any) -> Dict[str, Any]:
+        """Try to convert a custom model list to OpenAI format"""
+        if isinstance(models_data, dict) and "data" in models_data:
+            return models_data
+        elif isinstance(models_data, list):
+            models = []
+            for model in models_data:
+                if isinstance(model, str):
+                    models.append({
+                        "id": model,
+                        "object": "model",
+                        "created": int(time.time()),
+                        "owned_by": "custom"
+                    })
+            return {"data": models}
+        else:
+            return {"data": []}
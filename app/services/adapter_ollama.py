@@ -1,9 +1,11 @@
 import httpx
 import time
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
+from app.core.http_client import get_http_client
 from app.models.provider import Provider
 from app.schemas.chat import ChatCompletionRequest, ChatCompletionResponse
+from app.services.stream_codec import ChunkEncoder, NDJSONDecoder, UpstreamStream
 
 class OllamaAdapter:
     def __init__(self, provider: Provider):
@@ -11,12 +13,12 @@ class OllamaAdapter:
         self.base_url = provider.base_url.rstrip('/')
         self.config = provider.config or {}
     
-    def health_check(self) -> Dict[str, Any]:
-        """Check if Ollama is running and accessible"""
-        start_time = time.time()
+    async def async_health_check(self, timeout: float = 10) -> Dict[str, Any]:
+        """Check if Ollama is accessible without blocking the event loop"""
+        start_time = time.perf_counter()
         try:
-            response = httpx.get(f"{self.base_url}/api/tags", timeout=10)
-            latency = (time.time() - start_time) * 1000
+            response = await get_http_client().get(f"{self.base_url}/api/tags", timeout=timeout)
+            latency = (time.perf_counter() - start_time) * 1000
             
             if response.status_code == 200:
                 return {
@@ -58,20 +60,71 @@ class OllamaAdapter:
         if request.max_tokens is not None:
             ollama_payload["options"]["num_predict"] = request.max_tokens
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/chat",
-                json=ollama_payload,
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Ollama error: {response.status_code} - {response.text}")
-            
-            if stream:
-                return response.aiter_bytes()
+        if stream:
+            return await self._open_stream(ollama_payload, request.model)
+        
+        response = await get_http_client().post(
+            f"{self.base_url}/api/chat",
+            json=ollama_payload,
+            timeout=60
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Ollama error: {response.status_code} - {response.text}")
+        
+        return self._convert_ollama_response(response.json(), request.model)
+    
+    async def _open_stream(self, payload: Dict[str, Any], model: str) -> UpstreamStream:
+        """Start a streamed request, raising before any bytes are sent on upstream errors"""
+        client = get_http_client()
+        response = await client.send(
+            client.build_request(
+                "POST", f"{self.base_url}/api/chat", json=payload, timeout=httpx.Timeout(60, read=None)
+            ),
+            stream=True
+        )
+        
+        if response.status_code != 200:
+            body = await response.aread()
+            await response.aclose()
+            raise Exception(f"Ollama error: {response.status_code} - {body.decode(errors='replace')}")
+        
+        return UpstreamStream(response, self._stream_chunks(response, model))
+    
+    async def _stream_chunks(self, response: httpx.Response, model: str) -> AsyncIterator[bytes]:
+        """Convert Ollama's NDJSON chunks to OpenAI chat.completion.chunk events as they arrive"""
+        decoder = NDJSONDecoder()
+        encoder = ChunkEncoder(model, id_prefix="ollama")
+        finish_reason = None
+        
+        def convert(chunks) -> List[bytes]:
+            nonlocal finish_reason
+            events = []
+            for chunk in chunks:
+                if not isinstance(chunk, dict):
+                    continue
+                events.extend(encoder.content((chunk.get("message") or {}).get("content", "")))
+                if chunk.get("done"):
+                    finish_reason = chunk.get("done_reason")
+                    decoder.done = True
+            return events
+        
+        try:
+            async for data in response.aiter_bytes():
+                for event in convert(decoder.feed(data)):
+                    yield event
+                if decoder.done:
+                    break
             else:
-                return self._convert_ollama_response(response.json(), request.model)
+                # The upstream ended; its last line may lack a newline
+                for event in convert(decoder.close()):
+                    yield event
+            
+            for event in encoder.finish(finish_reason):
+                yield event
+        finally:
+            # Returns the connection to the shared pool
+            await response.aclose()
     
     def _convert_ollama_response(self, ollama_response: Dict[str, Any], model: str) -> Dict[str, Any]:
         """Convert Ollama response to OpenAI format"""
@@ -105,20 +158,22 @@ class OllamaAdapter:
         
         return openai_response
     
-    def get_models(self) -> Dict[str, Any]:
-        """Get available models from Ollama"""
-        response = httpx.get(f"{self.base_url}/api/tags", timeout=10)
+    async def list_models(self, timeout: float = 10) -> Dict[str, Any]:
+        """Get available models from Ollama without blocking the event loop"""
+        response = await get_http_client().get(f"{self.base_url}/api/tags", timeout=timeout)
         if response.status_code == 200:
-            models_data = response.json()
-            # Convert to OpenAI format
-            models = []
-            for model in models_data.get("models", []):
-                models.append({
-                    "id": model["name"],
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "ollama"
-                })
-            return {"data": models}
+            return self._convert_models(response.json())
         else:
             raise Exception(f"Failed to get Ollama models: {response.status_code}")
+    
+    def _convert_models(self, models_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert an Ollama tag list to OpenAI format"""
+        models = []
+        for model in models_data.get("models", []):
+            models.append({
+                "id": model["name"],
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "ollama"
+            })
+        return {"data": models}
@@ -1,9 +1,11 @@
 import httpx
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
 from app.models.provider import Provider
+from app.core.http_client import get_http_client
 from app.core.security import decrypt_secret
 from app.schemas.chat import ChatCompletionRequest, ChatCompletionResponse
+from app.services.stream_codec import UpstreamStream
 
 class OpenAIAdapter:
     def __init__(self, provider: Provider):
@@ -14,15 +16,15 @@ class OpenAIAdapter:
             self.api_key = decrypt_secret(provider.encrypted_api_key)
         self.headers = provider.headers or {}
     
-    def health_check(self) -> Dict[str, Any]:
-        """Check if the provider is accessible"""
-        start_time = time.time()
+    async def async_health_check(self, timeout: float = 10) -> Dict[str, Any]:
+        """Check if the provider is accessible without blocking the event loop"""
+        start_time = time.perf_counter()
         try:
             headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
             headers.update(self.headers)
             
-            response = httpx.get(f"{self.base_url}/models", headers=headers, timeout=10)
-            latency = (time.time() - start_time) * 1000
+            response = await get_http_client().get(f"{self.base_url}/models", headers=headers, timeout=timeout)
+            latency = (time.perf_counter() - start_time) * 1000
             
             if response.status_code == 200:
                 return {
@@ -53,28 +55,57 @@ class OpenAIAdapter:
         # Prepare the request payload
         payload = request.dict(exclude_unset=True)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        if stream:
+            return await self._open_stream(headers, payload)
+        
+        # Pooled connections skip the TCP/TLS handshake on every request
+        response = await get_http_client().post(
+            f"{self.base_url}/v1/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=60
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Provider error: {response.status_code} - {response.text}")
+        
+        return response.json()
+    
+    async def _open_stream(self, headers: Dict[str, str], payload: Dict[str, Any]) -> UpstreamStream:
+        """Start a streamed request, raising before any bytes are sent on upstream errors"""
+        client = get_http_client()
+        response = await client.send(
+            client.build_request(
+                "POST",
                 f"{self.base_url}/v1/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Provider error: {response.status_code} - {response.text}")
-            
-            if stream:
-                return response.aiter_bytes()
-            else:
-                return response.json()
+                timeout=httpx.Timeout(60, read=None)
+            ),
+            stream=True
+        )
+        
+        if response.status_code != 200:
+            body = await response.aread()
+            await response.aclose()
+            raise Exception(f"Provider error: {response.status_code} - {body.decode(errors='replace')}")
+        
+        return UpstreamStream(response, self._relay(response))
+    
+    async def _relay(self, response: httpx.Response) -> AsyncIterator[bytes]:
+        """Pass the provider's server-sent events through as they arrive"""
+        try:
+            async for data in response.aiter_bytes():
+                yield data
+        finally:
+            await response.aclose()
     
-    def get_models(self) -> Dict[str, Any]:
-        """Get available models from the provider"""
+    async def list_models(self, timeout: float = 10) -> Dict[str, Any]:
+        """Get available models from the provider without blocking the event loop"""
         headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
         headers.update(self.headers)
         
-        response = httpx.get(f"{self.base_url}/models", headers=headers, timeout=10)
+        response = await get_http_client().get(f"{self.base_url}/models", headers=headers, timeout=timeout)
         if response.status_code == 200:
             return response.json()
         else:
@@ -0,0 +1,185 @@
+import asyncio
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Optional
+from app.core.config import settings
+from app.models.apikey import KeyPriority
+from app.models.provider import Provider
+
+# Share of freed slots each lane receives while several lanes are waiting
+LANE_WEIGHTS = {
+    KeyPriority.HIGH: 4,
+    KeyPriority.NORMAL: 2,
+    KeyPriority.LOW: 1,
+}
+
+# Use the lane's configured wait
+LANE_DEFAULT_WAIT = object()
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted to a saturated provider"""
+    
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class ProviderLanes:
+    """Concurrency slots for one provider, shared by weighted priority lanes"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.in_flight = 0
+        self.waiters: Dict[KeyPriority, Deque[asyncio.Future]] = {lane: deque() for lane in LANE_WEIGHTS}
+        self._current_weight: Dict[KeyPriority, int] = {lane: 0 for lane in LANE_WEIGHTS}
+    
+    def limit(self, lane: KeyPriority) -> int:
+        """Slots a lane may occupy; the reserved share is kept for high priority"""
+        if lane == KeyPriority.HIGH:
+            return self.capacity
+        reserved = math.ceil(self.capacity * settings.SCHEDULER_HIGH_RESERVED_FRACTION)
+        return max(self.capacity - reserved, 1)
+    
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+    
+    def dispatch(self):
+        """Hand free slots to waiters using smooth weighted round robin"""
+        while True:
+            for lane in LANE_WEIGHTS:
+                # Drop waiters that timed out or were cancelled
+                while self.waiters[lane] and self.waiters[lane][0].done():
+                    self.waiters[lane].popleft()
+            
+            eligible = [
+                lane for lane in LANE_WEIGHTS
+                if self.waiters[lane] and self.in_flight < self.limit(lane)
+            ]
+            if not eligible:
+                return
+            
+            total = sum(LANE_WEIGHTS[lane] for lane in eligible)
+            for lane in eligible:
+                self._current_weight[lane] += LANE_WEIGHTS[lane]
+            chosen = max(eligible, key=lambda lane: self._current_weight[lane])
+            self._current_weight[chosen] -= total
+            
+            self.in_flight += 1
+            self.waiters[chosen].popleft().set_result(None)
+
+class AdmissionScheduler:
+    def __init__(self):
+        self._providers: Dict[int, ProviderLanes] = {}
+    
+    def _lanes(self, provider: Provider) -> ProviderLanes:
+        capacity = (provider.config or {}).get("max_concurrency", settings.PROVIDER_MAX_CONCURRENCY)
+        lanes = self._providers.get(provider.id)
+        if lanes is None:
+            lanes = self._providers[provider.id] = ProviderLanes(capacity)
+        elif lanes.capacity != capacity:
+            lanes.capacity = max(capacity, 1)
+        return lanes
+    
+    def _default_max_wait(self, lane: KeyPriority) -> Optional[float]:
+        if lane == KeyPriority.HIGH:
+            return None
+        if lane == KeyPriority.NORMAL:
+            return settings.SCHEDULER_NORMAL_MAX_WAIT
+        return settings.SCHEDULER_LOW_MAX_WAIT
+    
+    def _reject(self, lane: KeyPriority) -> AdmissionRejected:
+        if lane == KeyPriority.LOW:
+            return AdmissionRejected(429, "Provider is saturated; low-priority request rejected")
+        return AdmissionRejected(503, "Provider is saturated; try again shortly")
+    
+    async def acquire(
+        self,
+        provider: Provider,
+        lane: KeyPriority = KeyPriority.NORMAL,
+        max_wait: Optional[float] = LANE_DEFAULT_WAIT
+    ) -> Callable[[], None]:
+        """Wait for a provider slot and return a callable that releases it
+        
+        max_wait=None waits indefinitely; by default the lane's configured wait applies.
+        """
+        lane = KeyPriority(lane or KeyPriority.NORMAL)
+        if max_wait is LANE_DEFAULT_WAIT:
+            max_wait = self._default_max_wait(lane)
+        
+        lanes = self._lanes(provider)
+        if lanes.in_flight < lanes.limit(lane) and not lanes.waiters[lane]:
+            lanes.in_flight += 1
+            return self._releaser(lanes)
+        
+        # Every lane's queue is bounded, so even a flood of high-priority requests can't queue without limit
+        if max_wait == 0 or len(lanes.waiters[lane]) >= settings.SCHEDULER_MAX_QUEUE:
+            raise self._reject(lane)
+        
+        waiter = asyncio.get_running_loop().create_future()
+        lanes.waiters[lane].append(waiter)
+        lanes.dispatch()
+        try:
+            await asyncio.wait({waiter}, timeout=max_wait)
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            elif not waiter.cancelled() and asyncio.current_task().cancelling():
+                # Granted a slot just as the caller was cancelled
+                lanes.release()
+        
+        if waiter.cancelled():
+            raise self._reject(lane)
+        
+        return self._releaser(lanes)
+    
+    def _releaser(self, lanes: ProviderLanes) -> Callable[[], None]:
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                lanes.release()
+        
+        return release
+    
+    @asynccontextmanager
+    async def admit(
+        self,
+        provider: Provider,
+        lane: KeyPriority = KeyPriority.NORMAL,
+        max_wait: Optional[float] = LANE_DEFAULT_WAIT
+    ):
+        """Hold a provider slot for the duration of the block"""
+        release = await self.acquire(provider, lane, max_wait)
+        try:
+            yield
+        finally:
+            release()
+    
+    def in_flight(self, provider_id: int) -> int:
+        lanes = self._providers.get(provider_id)
+        return lanes.in_flight if lanes else 0
+    
+    def is_saturated(self, provider_id: int) -> bool:
+        lanes = self._providers.get(provider_id)
+        return lanes is not None and lanes.in_flight >= lanes.capacity
+    
+    def snapshot(self) -> Dict[int, dict]:
+        """Current slot usage and queue depth per provider"""
+        return {
+            provider_id: {
+                "capacity": lanes.capacity,
+                "in_flight": lanes.in_flight,
+                "queued": {
+                    lane.value: sum(1 for waiter in lanes.waiters[lane] if not waiter.done())
+                    for lane in LANE_WEIGHTS
+                },
+            }
+            for provider_id, lanes in self._providers.items()
+        }
+
+admission_scheduler = AdmissionScheduler()
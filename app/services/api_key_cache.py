@@ -0,0 +1,100 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.core.config import settings
+from app.core.events import event_bus
+from app.models.apikey import APIKey, KeyPriority, KeyStatus
+
+@dataclass(frozen=True)
+class KeyContext:
+    """What a verified API key grants, detached from any DB session"""
+    workspace_id: int
+    key_id: int
+    rpm: int
+    tpm: int
+    daily_cap: int
+    priority: KeyPriority = KeyPriority.NORMAL
+    # Spend caps in USD; None means no cap
+    daily_budget_usd: Optional[float] = None
+    monthly_budget_usd: Optional[float] = None
+    workspace_daily_budget_usd: Optional[float] = None
+    workspace_monthly_budget_usd: Optional[float] = None
+
+class APIKeyCache:
+    """Verified API keys by digest, so hot-path auth skips the database"""
+    
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, KeyContext]] = {}
+    
+    @staticmethod
+    def _digest(api_key: str) -> str:
+        # Raw keys are never held in memory longer than the request
+        return hashlib.sha256(api_key.encode()).hexdigest()
+    
+    def verify(self, db: Session, api_key: str) -> Optional[KeyContext]:
+        """Return the key's context, from cache when fresh, or None if the key is not active"""
+        digest = self._digest(api_key)
+        entry = self._entries.get(digest)
+        if entry and time.monotonic() - entry[0] < settings.API_KEY_CACHE_TTL:
+            return entry[1]
+        
+        db_key = db.query(APIKey).options(joinedload(APIKey.workspace)).filter(
+            APIKey.status == KeyStatus.ACTIVE,
+            APIKey.hashed_key == api_key  # Simplified for MVP
+        ).first()
+        if not db_key:
+            self._entries.pop(digest, None)
+            return None
+        
+        context = self._context(db_key)
+        self._entries[digest] = (time.monotonic(), context)
+        return context
+    
+    def load(self, db: Session, key_id: int) -> Optional[KeyContext]:
+        """Context of an active key by id, for work that runs after the request (e.g. async jobs)"""
+        db_key = db.query(APIKey).options(joinedload(APIKey.workspace)).filter(
+            APIKey.id == key_id,
+            APIKey.status == KeyStatus.ACTIVE
+        ).first()
+        return self._context(db_key) if db_key else None
+    
+    def prime(self, db: Session, limit: int) -> int:
+        """Load the most recently used active keys ahead of their first request"""
+        db_keys = db.query(APIKey).options(joinedload(APIKey.workspace)).filter(
+            APIKey.status == KeyStatus.ACTIVE
+        ).order_by(APIKey.last_used_at.desc().nullslast()).limit(limit).all()
+        
+        now = time.monotonic()
+        for db_key in db_keys:
+            # Stored keys are compared verbatim (see verify), so they digest the same way
+            self._entries[self._digest(db_key.hashed_key)] = (now, self._context(db_key))
+        return len(db_keys)
+    
+    @staticmethod
+    def _context(db_key: APIKey) -> KeyContext:
+        return KeyContext(
+            workspace_id=db_key.workspace_id,
+            key_id=db_key.id,
+            rpm=db_key.rpm,
+            tpm=db_key.tpm,
+            daily_cap=db_key.daily_cap,
+            priority=db_key.priority or KeyPriority.NORMAL,
+            daily_budget_usd=db_key.daily_budget_usd,
+            monthly_budget_usd=db_key.monthly_budget_usd,
+            workspace_daily_budget_usd=db_key.workspace.daily_budget_usd,
+            workspace_monthly_budget_usd=db_key.workspace.monthly_budget_usd
+        )
+    
+    def invalidate(self, key_id: Optional[int] = None):
+        if key_id is None:
+            self._entries.clear()
+            return
+        for digest, (_, context) in list(self._entries.items()):
+            if context.key_id == key_id:
+                del self._entries[digest]
+
+api_key_cache = APIKeyCache()
+
+event_bus.subscribe("api_key", lambda payload: api_key_cache.invalidate(payload.get("key_id")))
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import secrets
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.db import release_connection
+from app.core.rate_limit import RateLimiter
+from app.core.tracing import span, upstream_propagation
+from app.models.apikey import KeyPriority
+from app.models.provider import Provider
+from app.schemas.chat import BatchRequestItem, BatchResponseItem, ChatCompletionRequest
+from app.services.admission import admission_scheduler
+from app.services.api_key_cache import KeyContext
+from app.services.context_window import ContextWindowExceeded, fit_to_context
+from app.services.live_metrics import live_metrics
+from app.services.pricing import BudgetExceeded, price_table, spend_counters
+from app.services.provider_manager import ProviderManager
+from app.services.routing import Route
+from app.services.usage_tracker import UsageTracker
+
+class BatchProcessor:
+    def __init__(self, db: Session, key_context: KeyContext, max_concurrency: Optional[int] = None):
+        self.db = db
+        self.key_context = key_context
+        self.workspace_id = key_context.workspace_id
+        self.api_key_id = key_context.key_id
+        self.max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        self.provider_manager = ProviderManager(db)
+        self.usage_tracker = UsageTracker(db)
+        self.rate_limiter = RateLimiter()
+        self._routes: Dict[str, Tuple[Optional[Route], Optional[Provider], Any]] = {}
+    
+    @staticmethod
+    def parse(body: bytes) -> List[BatchRequestItem]:
+        """Parse a JSONL batch body into request items"""
+        items = []
+        for line_number, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            
+            try:
+                data = json.loads(line)
+                # Accept both OpenAI batch lines ({"custom_id", "body"}) and bare requests
+                if "body" not in data:
+                    data = {"custom_id": data.pop("custom_id", None), "body": data}
+                item = BatchRequestItem(**data)
+            except (ValueError, ValidationError) as e:
+                raise ValueError(f"Invalid batch line {line_number}: {e}")
+            
+            if item.url and item.url.rstrip("/") != "/v1/chat/completions":
+                raise ValueError(f"Invalid batch line {line_number}: unsupported url '{item.url}'")
+            
+            if item.custom_id is None:
+                item.custom_id = f"request-{line_number}"
+            items.append(item)
+        
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            raise ValueError(f"Batch exceeds the maximum of {settings.BATCH_MAX_REQUESTS} requests")
+        
+        return items
+    
+    def resolve_routes(self, items: List[BatchRequestItem]):
+        """Resolve every distinct model in the batch once, before fanning out"""
+        first_requests = {}
+        for item in items:
+            first_requests.setdefault(item.body.model, item.body)
+        
+        # Items for one model share a provider, which also keeps them on one prefix cache
+        for model_name, request in first_requests.items():
+            model, provider = self.provider_manager.resolve_model(self.workspace_id, model_name, request)
+            adapter = self.provider_manager.get_adapter(provider) if provider else None
+            self._routes[model_name] = (model, provider, adapter)
+    
+    async def run(self, items: List[BatchRequestItem]) -> AsyncIterator[Dict[str, Any]]:
+        """Run the batch and yield results in completion order"""
+        self.resolve_routes(items)
+        release_connection(self.db)
+        
+        pending = iter(items)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            for item in pending:
+                # Every item must enqueue exactly one result, or the reader below waits forever
+                try:
+                    outcome = await self._run_item(item)
+                except Exception as e:
+                    result = self._result(item)
+                    result.error = {"code": "internal_error", "message": str(e)}
+                    outcome = result.dict(), None
+                results.put_nowait(outcome)
+        
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.max_concurrency, len(items)))
+        ]
+        
+        log_entries = []
+        try:
+            for _ in range(len(items)):
+                result, log_entry = await results.get()
+                if log_entry:
+                    log_entries.append(log_entry)
+                    await live_metrics.record(
+                        self.workspace_id, log_entry["latency_ms"], log_entry["total_tokens"], log_entry["success"]
+                    )
+                if len(log_entries) >= settings.BATCH_LOG_FLUSH_SIZE:
+                    self.usage_tracker.log_requests(log_entries)
+                    log_entries = []
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            self.usage_tracker.log_requests(log_entries)
+    
+    @staticmethod
+    def _result(item: BatchRequestItem) -> BatchResponseItem:
+        return BatchResponseItem(id=f"batch_req_{secrets.token_hex(12)}", custom_id=item.custom_id)
+    
+    async def _run_item(self, item: BatchRequestItem) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Run a single batch item and return its result line and log entry"""
+        result = self._result(item)
+        model, provider, adapter = self._routes[item.body.model]
+        
+        if not model:
+            result.error = {"code": "model_not_found", "message": f"Model '{item.body.model}' not found"}
+            return result.dict(), None
+        if not adapter:
+            result.error = {"code": "provider_unavailable", "message": "Model provider is not available"}
+            return result.dict(), None
+        
+        # Batch items are always answered in full
+        request = ChatCompletionRequest(**item.body.dict(exclude_unset=True, exclude={"stream"}))
+        
+        # Items that can't fit the model's context window would only fail upstream
+        try:
+            request = fit_to_context(model, request)
+        except ContextWindowExceeded as e:
+            result.error = {"code": "context_length_exceeded", "message": e.detail}
+            return result.dict(), None
+        
+        # Each item is held to the rate limits and spend budgets like an interactive request
+        can_proceed, error_info = await self.rate_limiter.check_rate_limit(
+            str(self.api_key_id), self.key_context.rpm, self.key_context.tpm, self.key_context.daily_cap
+        )
+        if not can_proceed:
+            result.error = {"code": "rate_limit_exceeded", "message": error_info["error"]}
+            return result.dict(), None
+        
+        try:
+            reservation = await spend_counters.reserve(self.key_context, price_table.estimate(model, request))
+        except BudgetExceeded as e:
+            result.error = {"code": "budget_exceeded", "message": e.detail}
+            return result.dict(), None
+        
+        start_time = time.time()
+        log_entry = {
+            "workspace_id": self.workspace_id,
+            "model_id": model.id,
+            "api_key_id": self.api_key_id,
+            "model_name": request.model,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cost_usd": None,
+            "success": True,
+        }
+        try:
+            # Batch work queues behind interactive traffic instead of being shed
+            async with admission_scheduler.admit(provider, KeyPriority.LOW, max_wait=None):
+                with span("upstream.chat_completion", provider=provider.name, stream=False):
+                    with upstream_propagation(provider):
+                        response = await adapter.chat_completion(request, stream=False)
+            usage = response.get("usage") or {}
+            log_entry.update(
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                total_tokens=usage.get("total_tokens", 0),
+                cost_usd=price_table.cost(model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+            )
+            result.response = {"status_code": 200, "body": response}
+        except Exception as e:
+            log_entry.update(success=False, error_message=str(e))
+            result.error = {"code": "provider_error", "message": f"Provider error: {str(e)}"}
+        finally:
+            await spend_counters.settle(reservation, log_entry["cost_usd"])
+        
+        log_entry["latency_ms"] = (time.time() - start_time) * 1000
+        # Counted as each item finishes, so later items see the usage of earlier ones
+        await self.rate_limiter.increment_usage(str(self.api_key_id), log_entry["total_tokens"])
+        return result.dict(), log_entry
@@ -0,0 +1,98 @@
+import re
+from typing import List, Optional
+from app.core.config import settings
+from app.schemas.chat import ChatCompletionRequest, ChatMessage
+from app.services.routing import Route
+from app.services.tokens import TOKENS_PER_MESSAGE, TOKENS_PER_REQUEST, estimate_prompt_tokens, estimate_text_tokens
+
+REJECT = "reject"
+TRUNCATE = "truncate"
+SUMMARIZE = "summarize"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+class ContextWindowExceeded(Exception):
+    """Raised when a request can't be made to fit its model's context window"""
+    
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.status_code = 400
+        self.detail = detail
+
+def _message_tokens(msg: ChatMessage) -> int:
+    return TOKENS_PER_MESSAGE + estimate_text_tokens(msg.content)
+
+def _condense(messages: List[ChatMessage], budget: int) -> Optional[ChatMessage]:
+    """Extractive summary of dropped turns: the leading sentence of each, oldest first, within budget"""
+    lines = []
+    used = TOKENS_PER_MESSAGE + estimate_text_tokens("Earlier conversation, condensed:")
+    for msg in messages:
+        line = f"{msg.role}: {_SENTENCE_RE.split(msg.content.strip(), 1)[0]}"
+        cost = estimate_text_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return None
+    return ChatMessage(role="system", content="Earlier conversation, condensed:\n" + "\n".join(lines))
+
+def _shrink(request: ChatCompletionRequest, budget: int, summarize: bool) -> List[ChatMessage]:
+    """Drop the oldest turns until the prompt fits, keeping system messages and the latest message"""
+    messages = request.messages
+    pinned = {i for i, msg in enumerate(messages) if msg.role == "system"} | {len(messages) - 1}
+    used = TOKENS_PER_REQUEST + sum(_message_tokens(messages[i]) for i in pinned)
+    
+    # Newest turns are the most relevant, so they are kept first
+    kept = set(pinned)
+    for i in range(len(messages) - 2, -1, -1):
+        if i in kept:
+            continue
+        cost = _message_tokens(messages[i])
+        if used + cost > budget:
+            break
+        kept.add(i)
+        used += cost
+    
+    dropped = [msg for i, msg in enumerate(messages) if i not in kept]
+    result = [msg for i, msg in enumerate(messages) if i in kept]
+    if summarize and dropped:
+        summary = _condense(dropped, budget - used)
+        if summary is not None:
+            # After the leading system messages, where the dropped turns were
+            position = next((i for i, msg in enumerate(result) if msg.role != "system"), len(result))
+            result.insert(position, summary)
+    return result
+
+def fit_to_context(route: Route, request: ChatCompletionRequest) -> ChatCompletionRequest:
+    """Make a request fit its model's context window per the model's policy, clamping max_tokens to the rest"""
+    window = route.context_length
+    if not window:
+        return request
+    
+    policy = (route.meta or {}).get("context_policy", REJECT)
+    # Room for at least a short answer, or for the whole answer if max_tokens asks for less
+    min_completion = min(
+        request.max_tokens or settings.CONTEXT_MIN_COMPLETION_TOKENS, settings.CONTEXT_MIN_COMPLETION_TOKENS
+    )
+    prompt_tokens = estimate_prompt_tokens(request)
+    
+    if prompt_tokens + min_completion > window:
+        if policy not in (TRUNCATE, SUMMARIZE):
+            raise ContextWindowExceeded(
+                f"This model's maximum context length is {window} tokens, "
+                f"but the messages are about {prompt_tokens} tokens"
+            )
+        messages = _shrink(request, window - min_completion, summarize=policy == SUMMARIZE)
+        request = request.copy(update={"messages": messages})
+        prompt_tokens = estimate_prompt_tokens(request)
+        if prompt_tokens + min_completion > window:
+            raise ContextWindowExceeded(
+                f"The latest messages alone are about {prompt_tokens} tokens, "
+                f"over this model's {window} token context length"
+            )
+    
+    remaining = window - prompt_tokens
+    if request.max_tokens and request.max_tokens > remaining:
+        request = request.copy(update={"max_tokens": remaining})
+    return request
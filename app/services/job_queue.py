@@ -0,0 +1,176 @@
+import asyncio
+import enum
+import ipaddress
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from app.core.config import settings
+from app.core.rate_limit import background_redis_client
+from app.schemas.chat import ChatCompletionRequest
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    EXPIRED = "expired"
+
+# Pop the most urgent job and lease it to the caller in one atomic step
+CLAIM_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[1], popped[1])
+return popped[1]
+"""
+
+async def check_webhook_url(url: str):
+    """Reject webhook targets inside our network, raising ValueError; called on submit and again before delivery"""
+    if settings.JOB_WEBHOOK_ALLOW_PRIVATE:
+        return
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError("Webhook URL must be https")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port or 443)
+    except OSError:
+        raise ValueError(f"Webhook host '{parts.hostname}' does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError("Webhook URL must not point to a private, loopback or reserved address")
+
+class JobQueue:
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing"
+    
+    # Priority bands dominate the score; deadlines order jobs within a band
+    PRIORITY_BAND = 10 ** 10
+    
+    def __init__(self):
+        self.redis = background_redis_client
+        self._claim = self.redis.register_script(CLAIM_SCRIPT)
+    
+    def _job_key(self, job_id: str) -> str:
+        return f"job:{job_id}"
+    
+    def _score(self, priority: int, deadline_at: float) -> float:
+        return (9 - priority) * self.PRIORITY_BAND + deadline_at
+    
+    async def _save(self, job: Dict[str, Any], ttl: int):
+        await self.redis.set(self._job_key(job["id"]), json.dumps(job), ex=max(int(ttl), 1))
+    
+    async def submit(
+        self,
+        workspace_id: int,
+        api_key_id: int,
+        request: ChatCompletionRequest,
+        priority: int = 5,
+        deadline_seconds: Optional[int] = None,
+        webhook_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Store a job and put it on the queue"""
+        now = time.time()
+        deadline_at = now + (deadline_seconds or settings.JOB_DEFAULT_DEADLINE)
+        job = {
+            "id": f"job_{secrets.token_hex(12)}",
+            "status": JobStatus.QUEUED.value,
+            "workspace_id": workspace_id,
+            "api_key_id": api_key_id,
+            "model": request.model,
+            "request": request.dict(exclude_unset=True, exclude={"stream"}),
+            "priority": priority,
+            "webhook_url": webhook_url,
+            "created_at": now,
+            "deadline_at": deadline_at,
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        
+        await self._save(job, deadline_at - now + settings.JOB_RESULT_TTL)
+        await self.redis.zadd(self.QUEUE_KEY, {job["id"]: self._score(priority, deadline_at)})
+        return job
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id"""
+        data = await self.redis.get(self._job_key(job_id))
+        return json.loads(data) if data else None
+    
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the most urgent queued job, expiring it if its deadline has passed"""
+        now = time.time()
+        while True:
+            job_id = await self._claim(
+                keys=[self.QUEUE_KEY, self.PROCESSING_KEY],
+                args=[now + settings.JOB_LEASE_SECONDS]
+            )
+            if job_id is None:
+                return None
+            
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            job = await self.get(job_id)
+            if job is None:
+                # Job data expired while queued
+                await self.redis.zrem(self.PROCESSING_KEY, job_id)
+                continue
+            
+            if job["deadline_at"] < now:
+                await self.finish(job, JobStatus.EXPIRED, error="Job deadline passed before it could run")
+                continue
+            
+            job["status"] = JobStatus.RUNNING.value
+            job["started_at"] = now
+            await self._save(job, job["deadline_at"] - now + settings.JOB_RESULT_TTL)
+            return job
+    
+    async def renew_lease(self, job_id: str) -> bool:
+        """Extend a running job's lease; False if it was already lost to requeue_expired_leases"""
+        # xx: only touch a lease that still exists, never recreate one
+        return bool(await self.redis.zadd(
+            self.PROCESSING_KEY, {job_id: time.time() + settings.JOB_LEASE_SECONDS}, xx=True, ch=True
+        ))
+    
+    async def finish(
+        self,
+        job: Dict[str, Any],
+        status: JobStatus,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Store a job's outcome and release its lease"""
+        job["status"] = status.value
+        job["finished_at"] = time.time()
+        job["result"] = result
+        job["error"] = error
+        
+        await self._save(job, settings.JOB_RESULT_TTL)
+        await self.redis.zrem(self.PROCESSING_KEY, job["id"])
+        return job
+    
+    async def requeue_expired_leases(self) -> int:
+        """Put jobs whose worker died back on the queue"""
+        requeued = 0
+        for job_id in await self.redis.zrangebyscore(self.PROCESSING_KEY, "-inf", time.time()):
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            # Only the caller that removes the lease may requeue the job
+            if not await self.redis.zrem(self.PROCESSING_KEY, job_id):
+                continue
+            
+            job = await self.get(job_id)
+            if job is None:
+                continue
+            
+            job["status"] = JobStatus.QUEUED.value
+            job["started_at"] = None
+            await self._save(job, job["deadline_at"] - time.time() + settings.JOB_RESULT_TTL)
+            await self.redis.zadd(self.QUEUE_KEY, {job_id: self._score(job["priority"], job["deadline_at"])})
+            requeued += 1
+        
+        return requeued
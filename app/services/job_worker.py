@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import httpx
+from app.core.config import settings
+from app.core.db import SessionLocal, release_connection
+from app.core.rate_limit import RateLimiter
+from app.core.tracing import span, upstream_propagation
+from app.models.apikey import KeyPriority
+from app.schemas.chat import ChatCompletionRequest
+from app.services.admission import admission_scheduler
+from app.services.api_key_cache import api_key_cache
+from app.services.context_window import fit_to_context
+from app.services.job_queue import JobQueue, JobStatus, check_webhook_url
+from app.services.live_metrics import live_metrics
+from app.services.pricing import Reservation, price_table, spend_counters
+from app.services.provider_manager import ProviderManager
+from app.services.usage_tracker import UsageTracker
+
+logger = logging.getLogger(__name__)
+
+class InteractiveTraffic:
+    """Counts in-flight interactive requests so background work can yield to them"""
+    
+    def __init__(self):
+        self.active = 0
+    
+    @contextmanager
+    def track(self):
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+    
+    def is_busy(self) -> bool:
+        return 0 < settings.JOB_YIELD_TO_INTERACTIVE <= self.active
+
+interactive_traffic = InteractiveTraffic()
+
+class JobWorker:
+    def __init__(self, queue: Optional[JobQueue] = None, concurrency: Optional[int] = None):
+        self.queue = queue or JobQueue()
+        self.concurrency = settings.JOB_WORKERS if concurrency is None else concurrency
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+    
+    def start(self):
+        """Start the worker loops on the running event loop"""
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+    
+    async def stop(self):
+        """Stop the worker loops, letting running jobs finish"""
+        self._stopping = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _loop(self):
+        yielding_since = None
+        while not self._stopping:
+            # Interactive traffic wins over queued work, but only for so long, so jobs can't starve
+            if interactive_traffic.is_busy():
+                yielding_since = yielding_since or time.monotonic()
+                if time.monotonic() - yielding_since < settings.JOB_MAX_YIELD_SECONDS:
+                    await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                    continue
+            yielding_since = None
+            
+            try:
+                await self.queue.requeue_expired_leases()
+                job = await self.queue.claim()
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+            
+            if job is None:
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            
+            await self._process(job)
+    
+    async def _keep_lease(self, job_id: str):
+        """Renew a job's lease while it waits for admission and runs, so it isn't requeued and run twice"""
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                if not await self.queue.renew_lease(job_id):
+                    logger.warning("Lost the lease on job %s; another worker may run it again", job_id)
+                    return
+            except Exception:
+                logger.warning("Failed to renew the lease on job %s", job_id, exc_info=True)
+    
+    async def _process(self, job: Dict[str, Any]):
+        """Run a claimed job and record its outcome"""
+        lease = asyncio.create_task(self._keep_lease(job["id"]))
+        db = SessionLocal()
+        start_time = time.time()
+        model = None
+        reservation = Reservation()
+        cost_usd = None
+        try:
+            request = ChatCompletionRequest(**job["request"])
+            key_context = api_key_cache.load(db, job["api_key_id"])
+            if not key_context:
+                raise ValueError("API key is no longer active")
+            provider_manager = ProviderManager(db)
+            model, provider = provider_manager.resolve_model(job["workspace_id"], request.model, request)
+            if not model:
+                raise ValueError(f"Model '{request.model}' not found")
+            if not provider:
+                raise ValueError("Model provider is not available")
+            # Fit the model's context window as chat requests do; ContextWindowExceeded fails the job
+            request = fit_to_context(model, request)
+            
+            adapter = provider_manager.get_adapter(provider)
+            release_connection(db)
+            # Jobs are held to the spend budgets like interactive requests; BudgetExceeded fails the job
+            reservation = await spend_counters.reserve(key_context, price_table.estimate(model, request))
+            async with admission_scheduler.admit(provider, KeyPriority.LOW, max_wait=None):
+                with span("upstream.chat_completion", provider=provider.name, job_id=job["id"]):
+                    with upstream_propagation(provider):
+                        response = await adapter.chat_completion(request, stream=False)
+            
+            usage = response.get("usage") or {}
+            cost_usd = price_table.cost(model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+            await RateLimiter().increment_usage(str(job["api_key_id"]), usage.get("total_tokens", 0))
+            await spend_counters.settle(reservation, cost_usd)
+            latency_ms = (time.time() - start_time) * 1000
+            await live_metrics.record(job["workspace_id"], latency_ms, usage.get("total_tokens", 0), True)
+            UsageTracker(db).log_request(
+                workspace_id=job["workspace_id"],
+                model_id=model.id,
+                api_key_id=job["api_key_id"],
+                model_name=request.model,
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                total_tokens=usage.get("total_tokens", 0),
+                latency_ms=latency_ms,
+                success=True,
+                cost_usd=cost_usd
+            )
+            job = await self.queue.finish(job, JobStatus.SUCCEEDED, result=response)
+        except Exception as e:
+            await spend_counters.settle(reservation, cost_usd)
+            await live_metrics.record(job["workspace_id"], (time.time() - start_time) * 1000, 0, False)
+            if model is not None:
+                UsageTracker(db).log_request(
+                    workspace_id=job["workspace_id"],
+                    model_id=model.id,
+                    api_key_id=job["api_key_id"],
+                    model_name=job["model"],
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                    total_tokens=0,
+                    latency_ms=(time.time() - start_time) * 1000,
+                    success=False,
+                    error_message=str(e)
+                )
+            job = await self.queue.finish(job, JobStatus.FAILED, error=str(e))
+        finally:
+            lease.cancel()
+            db.close()
+        
+        if job.get("webhook_url"):
+            await self._notify(job)
+    
+    async def _notify(self, job: Dict[str, Any]):
+        """Deliver the finished job to its webhook"""
+        payload = {key: value for key, value in job.items() if key not in ("request", "api_key_id")}
+        try:
+            # Checked again at delivery, since the host's DNS may have changed since submission
+            await check_webhook_url(job["webhook_url"])
+            async with httpx.AsyncClient() as client:
+                await client.post(job["webhook_url"], json=payload, timeout=10)
+        except Exception:
+            logger.warning("Webhook delivery failed for job %s", job["id"], exc_info=True)
@@ -0,0 +1,103 @@
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.rate_limit import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram, in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, math.inf)
+
+def _bucket_field(latency_ms: float) -> str:
+    bound = next(bound for bound in LATENCY_BUCKETS_MS if latency_ms <= bound)
+    return f"le_{bound}"
+
+def _percentile(histogram: List[Tuple[float, int]], total: int, fraction: float) -> float:
+    """Upper bound of the bucket holding the given fraction of samples"""
+    if not total:
+        return 0.0
+    rank = fraction * total
+    seen = 0
+    for bound, count in histogram:
+        seen += count
+        if seen >= rank:
+            return bound if bound != math.inf else LATENCY_BUCKETS_MS[-2]
+    return LATENCY_BUCKETS_MS[-2]
+
+class LiveMetrics:
+    """Per-workspace request counters in one-second Redis buckets, summed over a sliding window"""
+    
+    def __init__(self):
+        self.redis = redis_client
+        self._snapshots: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+    
+    @staticmethod
+    def _key(workspace_id: int, second: int) -> str:
+        return f"live:{workspace_id}:{second}"
+    
+    async def record(self, workspace_id: int, latency_ms: float, tokens: int, success: bool):
+        """Count a finished request in the current second's bucket"""
+        key = self._key(workspace_id, int(time.time()))
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(key, "requests", 1)
+        pipe.hincrby(key, "tokens", tokens)
+        pipe.hincrbyfloat(key, "latency_ms_sum", latency_ms)
+        pipe.hincrby(key, _bucket_field(latency_ms), 1)
+        if not success:
+            pipe.hincrby(key, "errors", 1)
+        pipe.expire(key, settings.LIVE_METRICS_WINDOW + 5)
+        try:
+            await pipe.execute()
+        except (RedisError, OSError) as e:
+            logger.warning("Failed to record live metrics for workspace %s: %s", workspace_id, e)
+    
+    async def snapshot(self, workspace_id: int) -> Dict[str, Any]:
+        """Window totals, computed at most once per interval per worker however many dashboards are open"""
+        cached = self._snapshots.get(workspace_id)
+        if cached and time.monotonic() - cached[0] < settings.LIVE_METRICS_INTERVAL:
+            return cached[1]
+        
+        # The current second is still filling, so the window ends at the last complete one
+        now = int(time.time())
+        window = settings.LIVE_METRICS_WINDOW
+        pipe = self.redis.pipeline(transaction=False)
+        for second in range(now - window, now):
+            pipe.hgetall(self._key(workspace_id, second))
+        
+        totals: Dict[str, float] = {}
+        for bucket in await pipe.execute():
+            for field, value in bucket.items():
+                field = field.decode() if isinstance(field, bytes) else field
+                totals[field] = totals.get(field, 0) + float(value)
+        
+        requests = int(totals.get("requests", 0))
+        errors = int(totals.get("errors", 0))
+        histogram = [(bound, int(totals.get(f"le_{bound}", 0))) for bound in LATENCY_BUCKETS_MS]
+        snapshot = {
+            "timestamp": now,
+            "window_seconds": window,
+            "requests": requests,
+            "errors": errors,
+            "tokens": int(totals.get("tokens", 0)),
+            "rps": round(requests / window, 3),
+            "tokens_per_second": round(totals.get("tokens", 0) / window, 3),
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "latency_ms": {
+                "avg": round(totals.get("latency_ms_sum", 0) / requests, 2) if requests else 0.0,
+                "p50": _percentile(histogram, requests, 0.5),
+                "p90": _percentile(histogram, requests, 0.9),
+                "p99": _percentile(histogram, requests, 0.99),
+            },
+        }
+        self._snapshots[workspace_id] = (time.monotonic(), snapshot)
+        return snapshot
+    
+    @staticmethod
+    def event(snapshot: Dict[str, Any]) -> str:
+        return f"data: {json.dumps(snapshot)}\n\n"
+
+live_metrics = LiveMetrics()
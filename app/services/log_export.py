@@ -0,0 +1,180 @@
+import csv
+import importlib
+import io
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.requestlog import RequestLog
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.stream"}
+
+# CSV is gzipped whole; the columnar formats use pyarrow's built-in zstd, and Arrow streams can't do gzip
+DEFAULT_COMPRESSION = {"csv": "gzip", "parquet": "zstd", "arrow": "zstd"}
+
+COLUMNS = [
+    RequestLog.id,
+    RequestLog.created_at,
+    RequestLog.workspace_id,
+    RequestLog.api_key_id,
+    RequestLog.model_id,
+    RequestLog.model_name,
+    RequestLog.prompt_tokens,
+    RequestLog.completion_tokens,
+    RequestLog.total_tokens,
+    RequestLog.latency_ms,
+    RequestLog.cost_usd,
+    RequestLog.success,
+    RequestLog.error_message,
+]
+
+class ExportUnavailable(Exception):
+    """Raised when a format or compression needs an optional package that isn't installed"""
+
+def _require(module_name: str, purpose: str):
+    # pyarrow and zstandard are optional; only the exports that need them do
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise ExportUnavailable(f"{purpose} needs the '{module_name.split('.')[0]}' package")
+
+def _chunks(
+    workspace_id: int, start: Optional[datetime], end: Optional[datetime]
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Rows in id order, fetched through a server-side cursor a chunk at a time"""
+    # Its own session, since the stream outlives the request's dependencies
+    db = SessionLocal()
+    try:
+        query = db.query(*COLUMNS).filter(RequestLog.workspace_id == workspace_id)
+        if start:
+            query = query.filter(RequestLog.created_at >= start)
+        if end:
+            query = query.filter(RequestLog.created_at < end)
+        result = db.execute(
+            query.order_by(RequestLog.id).statement.execution_options(
+                stream_results=True, yield_per=settings.EXPORT_CHUNK_ROWS
+            )
+        )
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+    
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def _csv(chunks: Iterator[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in COLUMNS])
+    for rows in chunks:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("workspace_id", pa.int64()),
+        ("api_key_id", pa.int64()),
+        ("model_id", pa.int64()),
+        ("model_name", pa.string()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("total_tokens", pa.int64()),
+        ("latency_ms", pa.float64()),
+        ("cost_usd", pa.float64()),
+        ("success", pa.bool_()),
+        ("error_message", pa.string()),
+    ])
+
+def _columnar(chunks: Iterator[List[Tuple[Any, ...]]], open_writer: Callable, pa) -> Iterator[bytes]:
+    schema = _arrow_schema(pa)
+    sink = _Sink()
+    writer = open_writer(sink, schema)
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def _compressed(data: Iterator[bytes], compression: str) -> Iterator[bytes]:
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        finish = compressor.flush
+    elif compression == "zstd":
+        compressor = _require("zstandard", "zstd compression").ZstdCompressor().compressobj()
+        finish = compressor.flush
+    else:
+        yield from data
+        return
+    
+    for part in data:
+        compressed = compressor.compress(part)
+        if compressed:
+            yield compressed
+    yield finish()
+
+def export_logs(
+    workspace_id: int,
+    fmt: str,
+    compression: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Iterator[bytes]:
+    """Stream a workspace's request logs as CSV, Parquet or Arrow IPC, in constant memory"""
+    # Optional packages are checked now, so a missing one is an error response rather than a cut-off download
+    if fmt == "csv":
+        if compression == "zstd":
+            _require("zstandard", "zstd compression")
+        return _compressed(_csv(_chunks(workspace_id, start, end)), compression)
+    
+    # Parquet and Arrow compress their column data inside the file rather than being wrapped
+    pa = _require("pyarrow", f"{fmt} export")
+    codec = None if compression == "none" else compression
+    if fmt == "parquet":
+        parquet = _require("pyarrow.parquet", "parquet export")
+        
+        def open_writer(sink, schema):
+            return parquet.ParquetWriter(sink, schema, compression=codec or "none")
+    else:
+        if codec == "gzip":
+            raise ExportUnavailable("Arrow streams support zstd compression, not gzip")
+        
+        def open_writer(sink, schema):
+            return pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+    
+    return _columnar(_chunks(workspace_id, start, end), open_writer, pa)
@@ -0,0 +1,290 @@
+import copy
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+from app.schemas.chat import ChatCompletionRequest
+from app.services.stream_codec import STREAM_FORMATS, StreamDecoder, create_decoder
+
+# Fields forwarded to custom endpoints unless the mapping renames them
+DEFAULT_FIELDS = ("model", "temperature", "max_tokens", "stream")
+
+_SEGMENT_RE = re.compile(r"^(?P<name>[A-Za-z_][\w\-]*)?(?P<indexes>(?:\[(?:-?\d+|\*)\])*)$")
+_INDEX_RE = re.compile(r"\[(-?\d+|\*)\]")
+
+class MappingError(ValueError):
+    """Raised when a provider's request/response mapping is invalid"""
+
+class _Wildcard:
+    def __repr__(self):
+        return "*"
+
+WILDCARD = _Wildcard()
+
+Step = Union[str, int, _Wildcard]
+
+def parse_path(path: str) -> List[Step]:
+    """Parse a JSONPath-style path such as "$.output[0].text" or "choices[*].message.content" """
+    if not isinstance(path, str) or not path.strip():
+        raise MappingError(f"Invalid path {path!r}")
+    
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:].lstrip(".")
+    
+    steps: List[Step] = []
+    for segment in path.split(".") if path else []:
+        match = _SEGMENT_RE.match(segment)
+        if not match or not (match.group("name") or match.group("indexes")):
+            raise MappingError(f"Invalid path {path!r}: bad segment {segment!r}")
+        if match.group("name"):
+            steps.append(match.group("name"))
+        for index in _INDEX_RE.findall(match.group("indexes")):
+            steps.append(WILDCARD if index == "*" else int(index))
+    return steps
+
+def compile_getter(path: str) -> Callable[[Any], Any]:
+    """Compile a path into a function returning the value (or list of values for wildcards)"""
+    return _compile_steps(tuple(parse_path(path)))
+
+def _compile_steps(steps: tuple) -> Callable[[Any], Any]:
+    if WILDCARD not in steps:
+        def get(data: Any) -> Any:
+            try:
+                for step in steps:
+                    data = data[step]
+                return data
+            except (KeyError, IndexError, TypeError):
+                return None
+        return get
+    
+    # Split at the first wildcard and fan out over the rest of the path
+    split = steps.index(WILDCARD)
+    head = _compile_steps(steps[:split])
+    tail = _compile_steps(steps[split + 1:])
+    flatten = WILDCARD in steps[split + 1:]
+    
+    def get_many(data: Any) -> List[Any]:
+        items = head(data)
+        if not isinstance(items, list):
+            return []
+        values = []
+        for item in items:
+            value = tail(item)
+            if flatten:
+                values.extend(value)
+            elif value is not None:
+                values.append(value)
+        return values
+    return get_many
+
+def compile_setter(path: str) -> Callable[[Dict[str, Any], Any], None]:
+    """Compile a dotted path into a function that sets a value, creating nested objects"""
+    steps = parse_path(path)
+    if not steps or not all(isinstance(step, str) for step in steps):
+        raise MappingError(f"Invalid target path {path!r}: only object keys can be set")
+    
+    parents, leaf = tuple(steps[:-1]), steps[-1]
+    
+    def set_value(payload: Dict[str, Any], value: Any):
+        for step in parents:
+            payload = payload.setdefault(step, {})
+        payload[leaf] = value
+    return set_value
+
+def _require_dict(config: Any, name: str) -> Dict[str, Any]:
+    if config is None:
+        return {}
+    if not isinstance(config, dict):
+        raise MappingError(f"{name} must be an object")
+    return config
+
+class RequestMapping:
+    """Builds custom endpoint payloads from OpenAI-style requests"""
+    
+    def __init__(self, config: Optional[Dict[str, Any]]):
+        config = _require_dict(config, "request_mapping")
+        self.passthrough = not config
+        self.endpoint = config.get("endpoint", "/chat/completions")
+        if not isinstance(self.endpoint, str):
+            raise MappingError("request_mapping.endpoint must be a string")
+        self.headers = _require_dict(config.get("headers"), "request_mapping.headers")
+        self.additional_fields = _require_dict(config.get("additional_fields"), "request_mapping.additional_fields")
+        
+        messages = _require_dict(config.get("messages"), "request_mapping.messages")
+        self.set_messages = compile_setter(messages.get("field", "messages"))
+        self.role_field = messages.get("role_field", "role")
+        self.content_field = messages.get("content_field", "content")
+        
+        field_paths = {field: field for field in DEFAULT_FIELDS}
+        field_paths.update(_require_dict(config.get("fields"), "request_mapping.fields"))
+        for field in field_paths:
+            if field not in ChatCompletionRequest.model_fields or field == "messages":
+                raise MappingError(f"request_mapping.fields: unknown request field {field!r}")
+        self.field_setters = [
+            (field, compile_setter(path)) for field, path in field_paths.items() if path
+        ]
+    
+    def build(self, request: ChatCompletionRequest) -> Dict[str, Any]:
+        """Build the request payload according to custom configuration"""
+        if self.passthrough:
+            return request.dict(exclude_unset=True)
+        
+        payload: Dict[str, Any] = {}
+        role_field, content_field = self.role_field, self.content_field
+        self.set_messages(payload, [
+            {role_field: msg.role, content_field: msg.content} for msg in request.messages
+        ])
+        
+        for field, set_value in self.field_setters:
+            value = getattr(request, field)
+            if value is not None:
+                set_value(payload, value)
+        
+        if self.additional_fields:
+            payload.update(copy.deepcopy(self.additional_fields))
+        
+        return payload
+
+class ResponseMapping:
+    """Converts custom endpoint responses and stream chunks to OpenAI format"""
+    
+    def __init__(self, config: Optional[Dict[str, Any]]):
+        config = _require_dict(config, "response_mapping")
+        self.passthrough = not config
+        
+        if "content_path" in config:
+            self.get_content = compile_getter(config["content_path"])
+            self.get_choices = None
+        else:
+            # Legacy flat keys: choices_field[*].message_field.content_field
+            self.get_content = None
+            self.get_choices = compile_getter(config.get("choices_field", "choices"))
+            self.get_message = compile_getter(config.get("message_field", "message"))
+            self.content_field = config.get("content_field", "content")
+        
+        self.get_finish_reason = compile_getter(config["finish_reason_path"]) if "finish_reason_path" in config else None
+        self.get_usage = compile_getter(config.get("usage_field", "usage"))
+        self.usage_getters = {
+            name: compile_getter(config[f"{name}_path"])
+            for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+            if f"{name}_path" in config
+        }
+        self.get_chunk_content = compile_getter(
+            config.get("chunk_content_path", config.get("content_path", "choices[0].delta.content"))
+        )
+    
+    def _contents(self, response: Dict[str, Any]) -> List[str]:
+        if self.get_content is not None:
+            content = self.get_content(response)
+            if content is None:
+                return []
+            return [str(value) for value in content] if isinstance(content, list) else [str(content)]
+        
+        choices = self.get_choices(response)
+        if not isinstance(choices, list):
+            return []
+        contents = []
+        for choice in choices:
+            message = self.get_message(choice)
+            if message is None:
+                continue
+            contents.append(message.get(self.content_field, "") if isinstance(message, dict) else str(message))
+        return contents
+    
+    def _usage(self, response: Dict[str, Any]) -> Dict[str, int]:
+        usage = self.get_usage(response)
+        usage = usage if isinstance(usage, dict) else {}
+        
+        result = {}
+        for name in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            getter = self.usage_getters.get(name)
+            value = getter(response) if getter else usage.get(name)
+            result[name] = int(value or 0)
+        
+        if not result["total_tokens"]:
+            result["total_tokens"] = result["prompt_tokens"] + result["completion_tokens"]
+        return result
+    
+    def convert(self, response: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """Convert the custom response to OpenAI format"""
+        # Try to detect if it's already in OpenAI format
+        if self.passthrough and "choices" in response and "usage" in response:
+            return response
+        
+        finish_reason = self.get_finish_reason(response) if self.get_finish_reason else None
+        now = int(time.time())
+        return {
+            "id": f"custom-{now}",
+            "object": "chat.completion",
+            "created": now,
+            "model": model,
+            "choices": [
+                {
+                    "index": i,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason or "stop"
+                }
+                for i, content in enumerate(self._contents(response))
+            ],
+            "usage": self._usage(response)
+        }
+    
+    def chunk_content(self, chunk: Any) -> Optional[str]:
+        """Extract the text delta from one streamed chunk"""
+        content = self.get_chunk_content(chunk)
+        if isinstance(content, list):
+            content = "".join(str(value) for value in content)
+        return None if content is None else str(content)
+
+class StreamMapping:
+    """Describes how a custom endpoint frames streamed chunks"""
+    
+    def __init__(self, config: Optional[Dict[str, Any]], response: ResponseMapping):
+        config = _require_dict(config, "stream")
+        # OpenAI-compatible upstreams with no mapping are streamed through untouched
+        self.passthrough = not config and response.passthrough
+        
+        self.format = config.get("format", "sse")
+        if self.format not in STREAM_FORMATS:
+            raise MappingError(f"stream.format must be one of {', '.join(STREAM_FORMATS)}")
+        
+        self.done_marker = config.get("done_marker", "[DONE]" if self.format == "sse" else None)
+        if self.done_marker is not None and not isinstance(self.done_marker, str):
+            raise MappingError("stream.done_marker must be a string")
+        
+        self.prefix_bytes = config.get("length_prefix_bytes", 4)
+        if not isinstance(self.prefix_bytes, int) or not 1 <= self.prefix_bytes <= 8:
+            raise MappingError("stream.length_prefix_bytes must be an integer between 1 and 8")
+        
+        self.get_content = compile_getter(config["content_path"]) if "content_path" in config else None
+        self.get_done = compile_getter(config["done_path"]) if "done_path" in config else None
+        self.get_finish_reason = compile_getter(config["finish_reason_path"]) if "finish_reason_path" in config else None
+        self.response = response
+    
+    def create_decoder(self) -> StreamDecoder:
+        return create_decoder(self.format, self.done_marker, self.prefix_bytes)
+    
+    def content(self, chunk: Any) -> Optional[str]:
+        if self.get_content is None:
+            return self.response.chunk_content(chunk)
+        content = self.get_content(chunk)
+        if isinstance(content, list):
+            content = "".join(str(value) for value in content)
+        return None if content is None else str(content)
+    
+    def is_done(self, chunk: Any) -> bool:
+        return bool(self.get_done(chunk)) if self.get_done else False
+    
+    def finish_reason(self, chunk: Any) -> Optional[str]:
+        return self.get_finish_reason(chunk) if self.get_finish_reason else None
+
+class CompiledMappings:
+    def __init__(self, config: Optional[Dict[str, Any]]):
+        config = _require_dict(config, "config")
+        self.request = RequestMapping(config.get("request_mapping"))
+        self.response = ResponseMapping(config.get("response_mapping"))
+        self.stream = StreamMapping(config.get("stream"), self.response)
+
+def compile_mappings(config: Optional[Dict[str, Any]]) -> CompiledMappings:
+    """Compile and validate a custom HTTP provider's mapping config"""
+    return CompiledMappings(config)
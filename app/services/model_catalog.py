@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.db import SessionLocal
+from app.models.model import Model
+from app.models.provider import Provider
+from app.services.provider_manager import ProviderManager
+
+logger = logging.getLogger(__name__)
+
+class ModelCatalog:
+    """Per-workspace model list merged from the registry and live providers, served stale-while-revalidate"""
+    
+    def __init__(self):
+        self._entries: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+    
+    async def list_models(self, workspace_id: int) -> List[Dict[str, Any]]:
+        """Return the workspace's models, refreshing in the background once stale"""
+        entry = self._entries.get(workspace_id)
+        if entry:
+            age = time.monotonic() - entry[0]
+            if age < settings.MODELS_CACHE_TTL:
+                return entry[1]
+            if age < settings.MODELS_CACHE_STALE_TTL:
+                self._refresh_task(workspace_id)
+                return entry[1]
+        
+        return await asyncio.shield(self._refresh_task(workspace_id))
+    
+    def invalidate(self, workspace_id: Optional[int] = None):
+        if workspace_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(workspace_id, None)
+    
+    def _refresh_task(self, workspace_id: int) -> asyncio.Task:
+        """Start a refresh unless one is already running for the workspace"""
+        task = self._refreshing.get(workspace_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh(workspace_id))
+            task.add_done_callback(lambda _: self._refreshing.pop(workspace_id, None))
+            self._refreshing[workspace_id] = task
+        return task
+    
+    def _load(self, workspace_id: int) -> Tuple[List[Provider], List[Model], List[Tuple[Provider, Any]]]:
+        """Read the workspace's providers, registry rows and adapters; sync DB work, so run it in a thread"""
+        db = SessionLocal()
+        try:
+            providers = db.query(Provider).filter(
+                Provider.workspace_id == workspace_id,
+                Provider.is_active == True
+            ).all()
+            registry = db.query(Model).filter(
+                Model.provider_id.in_([provider.id for provider in providers]),
+                Model.is_active == True
+            ).all()
+            provider_manager = ProviderManager(db)
+            adapters = []
+            for provider in providers:
+                try:
+                    adapters.append((provider, provider_manager.get_adapter(provider)))
+                except ValueError:
+                    continue
+        finally:
+            db.close()
+        return providers, registry, adapters
+    
+    async def _refresh(self, workspace_id: int) -> List[Dict[str, Any]]:
+        providers, registry, adapters = await asyncio.to_thread(self._load, workspace_id)
+        live = await asyncio.gather(
+            *(
+                asyncio.wait_for(adapter.list_models(timeout=settings.MODELS_FETCH_TIMEOUT), settings.MODELS_FETCH_TIMEOUT)
+                for _, adapter in adapters
+            ),
+            return_exceptions=True
+        )
+        
+        provider_names = {provider.id: provider.name for provider in providers}
+        models: Dict[str, Dict[str, Any]] = {}
+        # Registered models come first; they are what the proxy can route
+        for model in registry:
+            models.setdefault(model.name, {
+                "id": model.name,
+                "object": "model",
+                "created": int(model.created_at.timestamp()) if model.created_at else int(time.time()),
+                "owned_by": provider_names.get(model.provider_id, "byom")
+            })
+        
+        for (provider, _), result in zip(adapters, live):
+            if isinstance(result, BaseException):
+                logger.warning("Listing models for provider %s failed: %s", provider.id, result)
+                continue
+            for model in (result or {}).get("data", []):
+                if isinstance(model, dict) and model.get("id"):
+                    models.setdefault(model["id"], {
+                        "id": model["id"],
+                        "object": "model",
+                        "created": model.get("created") or int(time.time()),
+                        "owned_by": provider.name
+                    })
+        
+        data = list(models.values())
+        self._entries[workspace_id] = (time.monotonic(), data)
+        return data
+
+model_catalog = ModelCatalog()
+
+event_bus.subscribe("catalog", lambda payload: model_catalog.invalidate(payload.get("workspace_id")))
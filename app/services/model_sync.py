@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.db import SessionLocal
+from app.core.rate_limit import background_redis_client
+from app.models.model import Model
+from app.models.provider import Provider
+from app.services.provider_manager import ProviderManager
+from app.services.routing import route_table
+
+logger = logging.getLogger(__name__)
+
+# Marks registry rows created by discovery; only these are ever deactivated by a sync
+DISCOVERY_SOURCE = "discovery"
+SYNC_LOCK_KEY = "models:sync:lock"
+
+# Listed models that can't serve chat completions (OpenAI lists image, audio and embedding models too)
+_NON_CHAT_RE = re.compile(r"embed|whisper|tts|dall-e|moderation|transcribe|image|rerank", re.IGNORECASE)
+
+def discovers_models(provider: Provider) -> bool:
+    """Whether a provider's model list should be synced into the registry; admins opt in per provider"""
+    return bool((provider.config or {}).get("auto_discover", False))
+
+def _model_ids(listing: Any) -> Set[str]:
+    return {
+        model["id"] for model in (listing or {}).get("data", [])
+        if isinstance(model, dict) and model.get("id") and not _NON_CHAT_RE.search(model["id"])
+    }
+
+class ModelSync:
+    """Periodically syncs the models table with what each provider serves"""
+    
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = settings.MODEL_SYNC_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the sync loop on the running event loop"""
+        self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    async def _loop(self):
+        while True:
+            try:
+                if await self._claim_round():
+                    await self.sync_all()
+            except Exception:
+                logger.exception("Model sync failed")
+            await asyncio.sleep(self.interval)
+    
+    async def _claim_round(self) -> bool:
+        """Let one process per interval run the sync"""
+        try:
+            return bool(await background_redis_client.set(SYNC_LOCK_KEY, 1, nx=True, ex=max(1, int(self.interval))))
+        except Exception:
+            logger.warning("Model sync lock unavailable, syncing anyway")
+            return True
+    
+    async def sync_all(self) -> Dict[int, Dict[str, int]]:
+        """Sync every discoverable provider, returning per-provider change counts"""
+        # Database work runs on a thread so the sync never blocks the event loop
+        targets = await asyncio.to_thread(self._targets)
+        listings = await asyncio.gather(
+            *(
+                asyncio.wait_for(adapter.list_models(timeout=settings.MODEL_SYNC_TIMEOUT), settings.MODEL_SYNC_TIMEOUT)
+                for _, _, adapter in targets
+            ),
+            return_exceptions=True
+        )
+        return await asyncio.to_thread(self._apply, targets, listings)
+    
+    def _targets(self) -> List[Tuple[int, int, Any]]:
+        """(provider id, workspace id, adapter) for every active provider that opted in"""
+        db = SessionLocal()
+        try:
+            provider_manager = ProviderManager(db)
+            targets = []
+            for provider in db.query(Provider).filter(Provider.is_active == True).all():
+                if not discovers_models(provider):
+                    continue
+                try:
+                    targets.append((provider.id, provider.workspace_id, provider_manager.get_adapter(provider)))
+                except ValueError:
+                    continue
+        finally:
+            # Don't hold a connection while waiting on upstreams
+            db.close()
+        return targets
+    
+    def _apply(self, targets: List[Tuple[int, int, Any]], listings: List[Any]) -> Dict[int, Dict[str, int]]:
+        """Write each provider's listing to the registry and announce any changes"""
+        changes: Dict[int, Dict[str, int]] = {}
+        workspaces = set()
+        db = SessionLocal()
+        try:
+            for (provider_id, workspace_id, _), listing in zip(targets, listings):
+                if isinstance(listing, BaseException):
+                    # An unreachable provider keeps its models; it may only be restarting
+                    logger.warning("Listing models for provider %s failed: %s", provider_id, listing)
+                    continue
+                try:
+                    counts = self.sync_provider(db, provider_id, _model_ids(listing))
+                except Exception:
+                    db.rollback()
+                    logger.exception("Syncing models for provider %s failed", provider_id)
+                    continue
+                if any(counts.values()):
+                    changes[provider_id] = counts
+                    workspaces.add(workspace_id)
+            
+            if changes:
+                event_bus.publish("routes")
+                route_table.refresh(db)
+                for workspace_id in workspaces:
+                    event_bus.publish("catalog", workspace_id=workspace_id)
+                logger.info("Model sync applied changes: %s", changes)
+        finally:
+            db.close()
+        return changes
+    
+    def sync_provider(self, db: Session, provider_id: int, names: Set[str]) -> Dict[str, int]:
+        """Diff one provider's live model names against its registry rows in a single transaction"""
+        rows: List[Model] = db.query(Model).filter(Model.provider_id == provider_id).all()
+        known = {row.name for row in rows}
+        
+        added = [
+            Model(name=name, provider_id=provider_id, meta={"source": DISCOVERY_SOURCE}, is_active=True)
+            for name in sorted(names - known)
+        ]
+        reactivated = deactivated = 0
+        for row in rows:
+            # Rows an admin created are left alone, even when the provider stops listing them
+            if (row.meta or {}).get("source") != DISCOVERY_SOURCE:
+                continue
+            meta = row.meta or {}
+            # Only rows the sync itself deactivated come back; an admin's deactivation sticks
+            if row.name in names and not row.is_active and meta.get("deactivated_by") == DISCOVERY_SOURCE:
+                row.is_active = True
+                row.meta = {key: value for key, value in meta.items() if key != "deactivated_by"}
+                reactivated += 1
+            elif row.name not in names and row.is_active:
+                row.is_active = False
+                row.meta = dict(meta, deactivated_by=DISCOVERY_SOURCE)
+                deactivated += 1
+        
+        if added or reactivated or deactivated:
+            db.add_all(added)
+            db.commit()
+        return {"added": len(added), "reactivated": reactivated, "deactivated": deactivated}
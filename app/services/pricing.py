@@ -0,0 +1,232 @@
+import calendar
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.rate_limit import CountersUnavailable, redis_client
+from app.schemas.chat import ChatCompletionRequest
+from app.services.api_key_cache import KeyContext
+from app.services.routing import Route
+from app.services.tokens import estimate_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+MICRO_USD = 1_000_000
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """USD per million tokens, from a model's meta["pricing"]"""
+    prompt: float
+    completion: float
+    
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.prompt + completion_tokens * self.completion) / 1_000_000
+
+class PriceTable:
+    """Per-model prices, parsed once per route table load rather than on every request"""
+    
+    def __init__(self):
+        self._prices: Dict[int, Tuple[dict, Optional[ModelPrice]]] = {}
+    
+    def price(self, route: Route) -> Optional[ModelPrice]:
+        entry = self._prices.get(route.id)
+        # Each route table load builds new meta dicts, so identity tells us the entry is current
+        if entry is None or entry[0] is not route.meta:
+            entry = self._prices[route.id] = (route.meta, self._compile(route))
+        return entry[1]
+    
+    @staticmethod
+    def _compile(route: Route) -> Optional[ModelPrice]:
+        pricing = (route.meta or {}).get("pricing")
+        if not pricing:
+            return None
+        try:
+            return ModelPrice(
+                prompt=float(pricing.get("prompt_per_million", 0)),
+                completion=float(pricing.get("completion_per_million", 0))
+            )
+        except (AttributeError, TypeError, ValueError):
+            logger.warning("Ignoring invalid pricing for model %s", route.name)
+            return None
+    
+    def cost(self, route: Route, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """Cost of a request in USD, or None if the model has no pricing"""
+        price = self.price(route)
+        if price is None:
+            return None
+        return round(price.cost(prompt_tokens, completion_tokens), 8)
+    
+    def estimate(self, route: Route, request: ChatCompletionRequest) -> Optional[float]:
+        """Most a request can cost: its estimated prompt plus the full completion allowance"""
+        completion_tokens = request.max_tokens or settings.BUDGET_DEFAULT_COMPLETION_TOKENS
+        return self.cost(route, estimate_prompt_tokens(request), completion_tokens * (request.n or 1))
+    
+def _periods(now: Optional[float] = None) -> Dict[str, str]:
+    now = time.time() if now is None else now
+    return {"day": time.strftime("%Y%m%d", time.gmtime(now)), "month": time.strftime("%Y%m", time.gmtime(now))}
+
+def _seconds_left(period: str, now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    if period == "day":
+        return 86400 - int(now) % 86400
+    today = time.gmtime(now)
+    days_in_month = calendar.monthrange(today.tm_year, today.tm_mon)[1]
+    return (days_in_month - today.tm_mday) * 86400 + 86400 - int(now) % 86400
+
+# Buckets outlive their period a little so the previous day and month can still be read
+PERIOD_TTLS = {"day": 2 * 86400, "month": 62 * 86400}
+
+# Charge every counter only if none would go over its cap; a negative cap means uncapped
+RESERVE_SCRIPT = """
+local amount = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local cap = tonumber(ARGV[i * 2])
+    if cap >= 0 and tonumber(redis.call('GET', key) or '0') + amount > cap then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('INCRBY', key, amount)
+    redis.call('EXPIRE', key, ARGV[i * 2 + 1])
+end
+return 0
+"""
+
+class BudgetExceeded(Exception):
+    """Raised when a request's estimated cost would take a workspace or key over budget"""
+    
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+@dataclass
+class Reservation:
+    """A request's spend counters and how much of its estimated cost they already hold, in micro-USD"""
+    keys: List[str] = field(default_factory=list)
+    ttls: List[int] = field(default_factory=list)
+    amount: int = 0
+
+class SpendCounters:
+    """Running per-workspace and per-key spend in Redis, in micro-USD, by UTC day and month"""
+    
+    def __init__(self):
+        self.redis = redis_client
+        self._reserve = self.redis.register_script(RESERVE_SCRIPT)
+    
+    @staticmethod
+    def key(scope: str, scope_id: int, period: str, bucket: str) -> str:
+        return f"spend:{scope}:{scope_id}:{period}:{bucket}"
+    
+    async def record(self, workspace_id: int, api_key_id: int, cost_usd: Optional[float]):
+        """Add a request's cost to the workspace and key counters"""
+        if not cost_usd:
+            return
+        
+        amount = int(round(cost_usd * MICRO_USD))
+        pipe = self.redis.pipeline(transaction=False)
+        for period, bucket in _periods().items():
+            for scope, scope_id in (("workspace", workspace_id), ("key", api_key_id)):
+                key = self.key(scope, scope_id, period, bucket)
+                pipe.incrby(key, amount)
+                pipe.expire(key, PERIOD_TTLS[period])
+        try:
+            await pipe.execute()
+        except (RedisError, OSError) as e:
+            # request_logs still has the cost; only the live view misses it
+            logger.warning("Failed to record spend for workspace %s: %s", workspace_id, e)
+    
+    async def reserve(self, key_context: KeyContext, cost_usd: Optional[float]) -> Reservation:
+        """Charge an estimated cost up front, or raise BudgetExceeded if any budget can't cover it"""
+        if cost_usd is None:
+            # Unpriced models have nothing to charge or settle
+            return Reservation()
+        
+        caps = {
+            ("workspace", "day"): key_context.workspace_daily_budget_usd,
+            ("workspace", "month"): key_context.workspace_monthly_budget_usd,
+            ("key", "day"): key_context.daily_budget_usd,
+            ("key", "month"): key_context.monthly_budget_usd,
+        }
+        periods = _periods()
+        scope_ids = {"workspace": key_context.workspace_id, "key": key_context.key_id}
+        slots = list(caps)
+        reservation = Reservation(
+            keys=[self.key(scope, scope_ids[scope], period, periods[period]) for scope, period in slots],
+            ttls=[PERIOD_TTLS[period] for _, period in slots]
+        )
+        if all(cap is None for cap in caps.values()):
+            # Nothing to enforce; the actual cost is still recorded on settle
+            return reservation
+        
+        amount = int(round(cost_usd * MICRO_USD))
+        args: List[int] = [amount]
+        for slot, ttl in zip(slots, reservation.ttls):
+            cap = caps[slot]
+            args += [-1 if cap is None else int(round(cap * MICRO_USD)), ttl]
+        
+        try:
+            exceeded = await self._reserve(keys=reservation.keys, args=args)
+        except (RedisError, OSError) as e:
+            if settings.REDIS_FAIL_OPEN:
+                logger.warning("Budget check unavailable, allowing request: %s", e)
+                return reservation
+            raise BudgetExceeded(503, "Budget check unavailable")
+        
+        if exceeded:
+            scope, period = slots[int(exceeded) - 1]
+            owner = "Workspace" if scope == "workspace" else "API key"
+            label = "daily" if period == "day" else "monthly"
+            raise BudgetExceeded(429, f"{owner} {label} budget exceeded", _seconds_left(period))
+        
+        reservation.amount = amount
+        return reservation
+    
+    async def settle(self, reservation: Reservation, cost_usd: Optional[float]):
+        """Replace a reservation with the request's actual cost; zero refunds it"""
+        delta = int(round((cost_usd or 0) * MICRO_USD)) - reservation.amount
+        if not reservation.keys or not delta:
+            return
+        reservation.amount += delta
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for key, ttl in zip(reservation.keys, reservation.ttls):
+            pipe.incrby(key, delta)
+            pipe.expire(key, ttl)
+        try:
+            await pipe.execute()
+        except (RedisError, OSError) as e:
+            logger.warning("Failed to settle spend reservation: %s", e)
+    
+    async def get(self, workspace_id: int, api_key_ids: Iterable[int] = ()) -> Dict[str, object]:
+        """Current day and month spend in USD for a workspace and the given keys"""
+        periods = _periods()
+        scopes = [("workspace", workspace_id)] + [("key", key_id) for key_id in api_key_ids]
+        keys = [
+            self.key(scope, scope_id, period, bucket)
+            for scope, scope_id in scopes
+            for period, bucket in periods.items()
+        ]
+        try:
+            values = iter(await self.redis.mget(keys))
+        except (RedisError, OSError) as e:
+            raise CountersUnavailable("Spend counters are unavailable; try again shortly") from e
+        
+        spend = {}
+        for scope, scope_id in scopes:
+            spend[(scope, scope_id)] = {
+                period: int(next(values) or 0) / MICRO_USD for period in periods
+            }
+        
+        return {
+            "day": periods["day"],
+            "month": periods["month"],
+            "workspace": spend.pop(("workspace", workspace_id)),
+            "keys": {scope_id: totals for (_, scope_id), totals in spend.items()}
+        }
+
+price_table = PriceTable()
+spend_counters = SpendCounters()
@@ -1,11 +1,43 @@
-from typing import List, Optional
+import asyncio
+import math
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from app.core.circuit_breaker import circuit_breakers
+from app.core.config import settings
+from app.core.events import event_bus
 from app.models.provider import Provider, ProviderType
+from app.schemas.chat import ChatCompletionRequest
 from app.schemas.provider import ProviderCreate, ProviderUpdate
 from app.core.security import encrypt_secret, decrypt_secret
 from app.services.adapter_openai import OpenAIAdapter
 from app.services.adapter_ollama import OllamaAdapter
 from app.services.adapter_http import HTTPAdapter
+from app.services.mapping import compile_mappings
+from app.services.routing import Route, route_table, prefix_router
+
+# Adapters keyed by provider id, reused until the provider row changes
+_adapter_cache: Dict[int, Tuple[tuple, object]] = {}
+
+def _adapter_version(provider: Provider) -> tuple:
+    return (provider.type, provider.updated_at, provider.base_url)
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list"""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+def invalidate_adapter(provider_id: Optional[int] = None):
+    if provider_id is None:
+        _adapter_cache.clear()
+    else:
+        _adapter_cache.pop(provider_id, None)
+
+event_bus.subscribe("provider", lambda payload: invalidate_adapter(payload.get("provider_id")))
+
+def validate_provider_config(provider_type: ProviderType, config: Optional[dict]):
+    """Reject provider configs that cannot be compiled, raising ValueError"""
+    if provider_type == ProviderType.HTTP:
+        compile_mappings(config)
 
 class ProviderManager:
     def __init__(self, db: Session):
@@ -13,6 +45,8 @@ class ProviderManager:
     
     def create_provider(self, provider_data: ProviderCreate, workspace_id: int) -> Provider:
         """Create a new provider"""
+        validate_provider_config(provider_data.type, provider_data.config)
+        
         encrypted_key = None
         if provider_data.api_key:
             encrypted_key = encrypt_secret(provider_data.api_key)
@@ -30,6 +64,7 @@ class ProviderManager:
         self.db.add(db_provider)
         self.db.commit()
         self.db.refresh(db_provider)
+        event_bus.publish("routes")
         return db_provider
     
     def get_providers(self, workspace_id: int) -> List[Provider]:
@@ -53,11 +88,16 @@ class ProviderManager:
             return None
         
         update_data = provider_data.dict(exclude_unset=True)
+        if "config" in update_data:
+            validate_provider_config(provider.type, update_data["config"])
+        
         for field, value in update_data.items():
             setattr(provider, field, value)
         
         self.db.commit()
         self.db.refresh(provider)
+        event_bus.publish("provider", provider_id=provider.id)
+        event_bus.publish("routes")
         return provider
     
     def delete_provider(self, provider_id: int, workspace_id: int) -> bool:
@@ -68,20 +108,61 @@ class ProviderManager:
         
         provider.is_active = False
         self.db.commit()
+        event_bus.publish("provider", provider_id=provider.id)
+        event_bus.publish("routes")
         return True
     
+    def resolve_model(
+        self,
+        workspace_id: int,
+        model_name: str,
+        request: Optional[ChatCompletionRequest] = None
+    ) -> Tuple[Optional[Route], Optional[Provider]]:
+        """Find an active model by name among the workspace's providers and pick one to serve it"""
+        routes = route_table.candidates(self.db, workspace_id, model_name)
+        if not routes:
+            return None, None
+        
+        active_routes = [route for route in routes if route.provider_active]
+        if not active_routes:
+            return routes[0], None
+        
+        # Prefer providers whose circuit is closed; if none are, try anyway
+        healthy_routes = [route for route in active_routes if not circuit_breakers.is_open(route.provider_id)]
+        active_routes = healthy_routes or active_routes
+        
+        # Equivalent providers are chosen by prompt-prefix affinity
+        route = prefix_router.choose(active_routes, request) if request else active_routes[0]
+        
+        provider = self.db.query(Provider).filter(
+            Provider.id == route.provider_id,
+            Provider.workspace_id == workspace_id
+        ).first()
+        if not provider or not provider.is_active:
+            return route, None
+        
+        return route, provider
+    
     def get_adapter(self, provider: Provider):
         """Get the appropriate adapter for a provider"""
+        version = _adapter_version(provider)
+        cached = _adapter_cache.get(provider.id)
+        if cached and cached[0] == version:
+            return cached[1]
+        
         if provider.type == ProviderType.OPENAI:
-            return OpenAIAdapter(provider)
+            adapter = OpenAIAdapter(provider)
         elif provider.type == ProviderType.OLLAMA:
-            return OllamaAdapter(provider)
+            adapter = OllamaAdapter(provider)
         elif provider.type == ProviderType.HTTP:
-            return HTTPAdapter(provider)
+            adapter = HTTPAdapter(provider)
         else:
             raise ValueError(f"Unsupported provider type: {provider.type}")
+        
+        _adapter_cache[provider.id] = (version, adapter)
+        return adapter
     
-    def test_provider(self, provider_id: int, workspace_id: int) -> dict:
+    async def test_provider(self, provider_id: int, workspace_id: int) -> dict:
         """Test a provider's connectivity"""
         provider = self.get_provider(provider_id, workspace_id)
         if not provider:
@@ -89,7 +170,54 @@ class ProviderManager:
         
         try:
             adapter = self.get_adapter(provider)
-            result = adapter.health_check()
-            return result
+            return await adapter.async_health_check(timeout=settings.PROVIDER_TEST_DEADLINE)
         except Exception as e:
             return {"success": False, "message": str(e), "error": str(e)}
+    
+    async def test_providers(self, workspace_id: int, samples: int, deadline_seconds: float) -> List[dict]:
+        """Probe every provider in a workspace concurrently within one shared deadline"""
+        deadline = asyncio.get_running_loop().time() + deadline_seconds
+        providers = self.get_providers(workspace_id)
+        return list(await asyncio.gather(
+            *(self._probe_provider(provider, samples, deadline) for provider in providers)
+        ))
+    
+    async def _probe_provider(self, provider: Provider, samples: int, deadline: float) -> dict:
+        """Run sequential health probes against one provider until done or out of time"""
+        loop = asyncio.get_running_loop()
+        results = []
+        try:
+            adapter = self.get_adapter(provider)
+        except ValueError as e:
+            results.append({"success": False, "error": str(e)})
+            adapter = None
+        
+        while adapter and len(results) < samples:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                # httpx timeouts are per operation, so bound the whole probe too
+                results.append(await asyncio.wait_for(adapter.async_health_check(timeout=remaining), remaining))
+            except asyncio.TimeoutError:
+                results.append({"success": False, "error": "Deadline exceeded"})
+                break
+        
+        latencies = sorted(result["latency_ms"] for result in results if result.get("success"))
+        errors = [result.get("error") or result.get("message") for result in results if not result.get("success")]
+        return {
+            "provider_id": provider.id,
+            "name": provider.name,
+            "type": provider.type,
+            "success": bool(results) and not errors,
+            "samples": len(results),
+            "successes": len(latencies),
+            "latency_ms": {
+                "min": latencies[0],
+                "p50": _percentile(latencies, 50),
+                "p90": _percentile(latencies, 90),
+                "p99": _percentile(latencies, 99),
+                "max": latencies[-1]
+            } if latencies else None,
+            "error": errors[-1] if errors else None
+        }
@@ -0,0 +1,208 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.events import event_bus
+from app.models.model import Model
+from app.models.provider import Provider
+from app.schemas.chat import ChatCompletionRequest
+from app.services.admission import admission_scheduler
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Route:
+    """A model as served by one provider, detached from any DB session"""
+    id: int
+    name: str
+    workspace_id: int
+    provider_id: int
+    provider_active: bool
+    context_length: Optional[int] = None
+    meta: dict = field(default_factory=dict)
+
+class RouteTable:
+    """In-memory (workspace, model name) -> provider routes, reloaded in a background thread once stale"""
+    
+    def __init__(self):
+        self._routes: Dict[Tuple[int, str], List[Route]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pending = False
+    
+    def _load(self, db: Session):
+        rows = db.query(Model, Provider.workspace_id, Provider.is_active).join(
+            Provider, Model.provider_id == Provider.id
+        ).filter(
+            Model.is_active == True
+        ).order_by(Model.id).all()
+        
+        # A workspace only ever routes to its own providers, which hold its upstream credentials
+        routes: Dict[Tuple[int, str], List[Route]] = {}
+        for model, workspace_id, provider_active in rows:
+            routes.setdefault((workspace_id, model.name), []).append(Route(
+                id=model.id,
+                name=model.name,
+                workspace_id=workspace_id,
+                provider_id=model.provider_id,
+                provider_active=bool(provider_active),
+                context_length=model.context_length,
+                meta=dict(model.meta or {})
+            ))
+        
+        self._routes = routes
+        self._loaded_at = time.monotonic()
+    
+    def candidates(self, db: Session, workspace_id: int, model_name: str) -> List[Route]:
+        """All active routes for a model name among the workspace's providers"""
+        if self._loaded_at is None:
+            # Nothing to serve yet (warmup normally covers this), so the first request loads inline
+            self._load(db)
+        elif time.monotonic() - self._loaded_at > settings.ROUTE_TABLE_TTL:
+            self._refresh_in_background()
+        return self._routes.get((workspace_id, model_name), [])
+    
+    def refresh(self, db: Session):
+        self._load(db)
+    
+    def invalidate(self):
+        """Reload now, serving the current routes until the new ones are in"""
+        self._refresh_in_background()
+    
+    def _refresh_in_background(self):
+        """Start a reload thread unless one is running; a request during a reload queues one more pass"""
+        with self._lock:
+            if self._refreshing:
+                self._pending = True
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, name="route-table-refresh", daemon=True).start()
+    
+    def _refresh_worker(self):
+        while True:
+            db = SessionLocal()
+            try:
+                self._load(db)
+            except Exception:
+                logger.exception("Route table reload failed; serving the previous routes")
+            finally:
+                db.close()
+            
+            with self._lock:
+                if not self._pending:
+                    self._refreshing = False
+                    return
+                self._pending = False
+
+class HashRing:
+    """Consistent hash ring over provider ids"""
+    
+    def __init__(self, provider_ids: List[int], replicas: int):
+        points = []
+        for provider_id in provider_ids:
+            for replica in range(replicas):
+                points.append((_hash(f"{provider_id}:{replica}"), provider_id))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+    
+    def walk(self, key_hash: int) -> List[int]:
+        """Provider ids in ring order starting from the owner of key_hash"""
+        start = bisect.bisect(self._hashes, key_hash) % len(self._hashes)
+        order = []
+        for i in range(len(self._owners)):
+            owner = self._owners[(start + i) % len(self._owners)]
+            if owner not in order:
+                order.append(owner)
+        return order
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class PrefixRouter:
+    """Pins requests that share a prompt prefix to the same provider so upstream prefix caches hit"""
+    
+    def __init__(self):
+        self._rings: Dict[Tuple[int, str, Tuple[int, ...]], HashRing] = {}
+        self._seen: Dict[int, OrderedDict] = {}
+        self._stats: Dict[int, Dict[str, int]] = {}
+    
+    def prefix_key(self, request: ChatCompletionRequest) -> Optional[str]:
+        """Hash of the leading system messages (or the first message), if long enough to matter"""
+        prefix = []
+        for msg in request.messages:
+            if msg.role != "system":
+                break
+            prefix.append(msg)
+        if not prefix and request.messages:
+            prefix = request.messages[:1]
+        
+        text = "\x1e".join(f"{msg.role}\x1f{msg.content}" for msg in prefix)
+        if len(text) < settings.PREFIX_AFFINITY_MIN_CHARS:
+            return None
+        return hashlib.sha256(f"{request.model}\x1d{text}".encode()).hexdigest()
+    
+    def _ring(self, workspace_id: int, model_name: str, provider_ids: List[int]) -> HashRing:
+        """One ring per (workspace, model), rebuilt when its provider set changes"""
+        members = tuple(sorted(provider_ids))
+        ring_key = (workspace_id, model_name, members)
+        ring = self._rings.get(ring_key)
+        if ring is None:
+            ring = self._rings[ring_key] = HashRing(list(members), settings.PREFIX_AFFINITY_REPLICAS)
+        return ring
+    
+    def choose(self, routes: List[Route], request: ChatCompletionRequest) -> Route:
+        """Pick the route for a request among equivalent providers"""
+        if len(routes) == 1:
+            return routes[0]
+        
+        by_provider = {route.provider_id: route for route in routes}
+        prefix = self.prefix_key(request)
+        if prefix is None:
+            # No shared prefix worth pinning; spread load instead
+            return min(routes, key=lambda route: admission_scheduler.in_flight(route.provider_id))
+        
+        route = routes[0]
+        order = self._ring(route.workspace_id, route.name, list(by_provider)).walk(int(prefix[:16], 16))
+        chosen = next(
+            (provider_id for provider_id in order if not admission_scheduler.is_saturated(provider_id)),
+            order[0]
+        )
+        self._record(chosen, prefix, affinity=chosen == order[0])
+        return by_provider[chosen]
+    
+    def _record(self, provider_id: int, prefix: str, affinity: bool):
+        stats = self._stats.setdefault(provider_id, {
+            "requests": 0, "affinity_routed": 0, "fallback_routed": 0, "prefix_hits": 0
+        })
+        stats["requests"] += 1
+        stats["affinity_routed" if affinity else "fallback_routed"] += 1
+        
+        seen = self._seen.setdefault(provider_id, OrderedDict())
+        if prefix in seen:
+            stats["prefix_hits"] += 1
+            seen.move_to_end(prefix)
+        else:
+            seen[prefix] = True
+            if len(seen) > settings.PREFIX_AFFINITY_TRACKED:
+                seen.popitem(last=False)
+    
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Per-provider routing counters and prefix hit rate"""
+        return {
+            provider_id: dict(stats, prefix_hit_rate=round(stats["prefix_hits"] / stats["requests"], 4))
+            for provider_id, stats in self._stats.items()
+        }
+
+route_table = RouteTable()
+prefix_router = PrefixRouter()
+
+event_bus.subscribe("routes", lambda payload: route_table.invalidate())
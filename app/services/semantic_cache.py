@@ -0,0 +1,300 @@
+import asyncio
+import fcntl
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.rate_limit import redis_client
+from app.schemas.chat import ChatCompletionRequest
+from app.services.routing import Route
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that can differ between two prompts without changing what is being asked
+_STOPWORDS = frozenset(
+    "a an the and or of to for in on at by with about me my i you your it its is are be please "
+    "can could would will write give tell show what how some this that named called".split()
+)
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip punctuation so trivial rewordings embed identically"""
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+def hashing_embedder(text: str, dim: int) -> np.ndarray:
+    """Local feature-hashing embedding over words, word pairs and character trigrams"""
+    vector = np.zeros(dim, dtype=np.float32)
+    words = text.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+    
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def same_request(a: str, b: str) -> bool:
+    """Whether two normalized prompts share all their content words; guards against near-misses like dog vs cat"""
+    return set(a.split()) - _STOPWORDS == set(b.split()) - _STOPWORDS
+
+def load_embedder() -> Callable[[str, int], np.ndarray]:
+    """Load the configured embedding function ("module:function"), or the built-in one"""
+    if not settings.SEMANTIC_CACHE_EMBEDDER:
+        return hashing_embedder
+    
+    module_name, _, function_name = settings.SEMANTIC_CACHE_EMBEDDER.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+class VectorIndex:
+    """Fixed-capacity cosine index, flat for small sizes and IVF once it grows"""
+    
+    def __init__(self, dim: int, capacity: int, path: Optional[str] = None):
+        self.dim = dim
+        self.capacity = capacity
+        self.path = path
+        self.keys: List[Optional[str]] = [None] * capacity
+        self.size = 0
+        self.cursor = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.full(capacity, -1, dtype=np.int32)
+        self._built_at_size = 0
+        self._unsaved = 0
+        self._lock_file = None
+        # Writers run on worker threads; searches read without it and at worst miss a fresh entry
+        self._write_lock = threading.Lock()
+        
+        if path and not self._lock(path):
+            # Slots and keys live in this process, so only one worker may map the files
+            logger.info("Semantic cache index %s is owned by another worker; keeping this one in memory", path)
+            self.path = path = None
+        
+        if path:
+            meta = self._load_meta()
+            mode = "r+" if meta and os.path.exists(f"{path}.vec") else "w+"
+            self.vectors = np.memmap(f"{path}.vec", dtype=np.float32, mode=mode, shape=(capacity, dim))
+            if mode == "r+":
+                self.keys, self.size, self.cursor = meta["keys"], meta["size"], meta["cursor"]
+                self.build_ivf()
+        else:
+            self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+    
+    def _lock(self, path: str) -> bool:
+        """Take an exclusive, process-lifetime lock on the index files"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = open(f"{path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def _load_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(f"{self.path}.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("dim") != self.dim or meta.get("capacity") != self.capacity:
+            return None
+        return meta
+    
+    def add(self, vector: np.ndarray, key: str):
+        """Insert a vector, overwriting the oldest entry once full; may rebuild the IVF and flush, so call it off the loop"""
+        with self._write_lock:
+            self._add(vector, key)
+    
+    def _add(self, vector: np.ndarray, key: str):
+        slot = self.cursor
+        self.vectors[slot] = vector
+        self.keys[slot] = key
+        self.cursor = (self.cursor + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        
+        if self.centroids is not None:
+            self.assignments[slot] = int(np.argmax(self.centroids @ vector))
+        if self.size >= settings.SEMANTIC_CACHE_IVF_THRESHOLD and self.size >= 2 * self._built_at_size:
+            self.build_ivf()
+        
+        self._unsaved += 1
+        if self.path and self._unsaved >= 50:
+            self._flush()
+    
+    def build_ivf(self, iterations: int = 8):
+        """Cluster the stored vectors with spherical k-means for coarse search"""
+        if self.size < settings.SEMANTIC_CACHE_IVF_THRESHOLD:
+            self.centroids = None
+            return
+        
+        data = np.asarray(self.vectors[:self.size])
+        nlist = max(int(np.sqrt(self.size)), 1)
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(self.size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = data[assignments == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm:
+                        centroids[cluster] = centroid / norm
+        
+        self.centroids = centroids
+        self.assignments[:self.size] = np.argmax(data @ centroids.T, axis=1)
+        self._built_at_size = self.size
+    
+    def search(self, vector: np.ndarray) -> Tuple[float, Optional[str]]:
+        """Return the best cosine score and its key"""
+        if self.size == 0:
+            return 0.0, None
+        
+        if self.centroids is not None:
+            nprobe = min(settings.SEMANTIC_CACHE_IVF_NPROBE, len(self.centroids))
+            probes = np.argpartition(-(self.centroids @ vector), nprobe - 1)[:nprobe]
+            candidates = np.nonzero(np.isin(self.assignments[:self.size], probes))[0]
+            if len(candidates) == 0:
+                return 0.0, None
+        else:
+            candidates = np.arange(self.size)
+        
+        scores = np.asarray(self.vectors[candidates]) @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.keys[int(candidates[best])]
+    
+    def flush(self):
+        """Persist the index metadata and flush the memory-mapped vectors"""
+        with self._write_lock:
+            self._flush()
+    
+    def _flush(self):
+        if not self.path:
+            return
+        self.vectors.flush()
+        tmp_path = f"{self.path}.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "keys": self.keys,
+                "size": self.size,
+                "cursor": self.cursor
+            }, f)
+        os.replace(tmp_path, f"{self.path}.json")
+        self._unsaved = 0
+
+class SemanticCache:
+    def __init__(self):
+        self.redis = redis_client
+        self._indexes: Dict[Tuple[int, str], VectorIndex] = {}
+        self._embed: Optional[Callable[[str, int], np.ndarray]] = None
+    
+    def is_enabled(self, model: Route, request: ChatCompletionRequest) -> bool:
+        """The cache is opt-in globally and per model, and only serves single, non-streamed answers"""
+        return (
+            settings.SEMANTIC_CACHE_ENABLED
+            and bool((model.meta or {}).get("semantic_cache"))
+            and not request.stream
+            and (request.n or 1) == 1
+            and any(msg.role == "user" for msg in request.messages)
+        )
+    
+    def _index(self, workspace_id: int, model_name: str) -> VectorIndex:
+        index_key = (workspace_id, model_name)
+        index = self._indexes.get(index_key)
+        if index is None:
+            path = None
+            if settings.SEMANTIC_CACHE_DIR:
+                model_hash = hashlib.sha1(model_name.encode()).hexdigest()[:12]
+                path = os.path.join(settings.SEMANTIC_CACHE_DIR, f"ws{workspace_id}", model_hash)
+            index = self._indexes[index_key] = VectorIndex(
+                settings.SEMANTIC_CACHE_DIM, settings.SEMANTIC_CACHE_MAX_ENTRIES, path
+            )
+        return index
+    
+    def _split(self, request: ChatCompletionRequest) -> Tuple[str, str]:
+        """Split a request into the normalized last user message and a hash of everything else"""
+        last_user = max(i for i, msg in enumerate(request.messages) if msg.role == "user")
+        context = {
+            "messages": [
+                [msg.role, msg.content] for i, msg in enumerate(request.messages) if i != last_user
+            ],
+            "params": request.dict(include={"temperature", "top_p", "max_tokens", "stop"})
+        }
+        context_hash = hashlib.sha256(json.dumps(context, sort_keys=True).encode()).hexdigest()
+        return normalize_text(request.messages[last_user].content), context_hash
+    
+    def _vector(self, text: str) -> np.ndarray:
+        if self._embed is None:
+            self._embed = load_embedder()
+        return np.asarray(self._embed(text, settings.SEMANTIC_CACHE_DIM), dtype=np.float32)
+    
+    async def lookup(self, workspace_id: int, request: ChatCompletionRequest) -> Optional[Dict[str, Any]]:
+        """Return a cached completion for a sufficiently similar prompt"""
+        text, context_hash = self._split(request)
+        score, entry_key = self._index(workspace_id, request.model).search(self._vector(text))
+        if entry_key is None or score < settings.SEMANTIC_CACHE_THRESHOLD:
+            return None
+        
+        # The cache is an optimization; when Redis is unreachable the request is just a miss
+        try:
+            data = await self.redis.get(entry_key)
+        except (RedisError, OSError) as e:
+            logger.warning("Semantic cache lookup failed, treating as a miss: %s", e)
+            return None
+        if not data:
+            return None
+        
+        entry = json.loads(data)
+        if entry["context"] != context_hash:
+            return None
+        if settings.SEMANTIC_CACHE_VERIFY and not same_request(entry.get("prompt", ""), text):
+            return None
+        
+        response = entry["response"]
+        response["created"] = int(time.time())
+        return response
+    
+    async def store(self, workspace_id: int, request: ChatCompletionRequest, response: Dict[str, Any]):
+        """Cache a completion under its prompt embedding"""
+        text, context_hash = self._split(request)
+        entry_key = f"semcache:{workspace_id}:{hashlib.sha256((text + context_hash).encode()).hexdigest()}"
+        try:
+            await self.redis.set(
+                entry_key,
+                json.dumps({"context": context_hash, "prompt": text, "response": response}),
+                ex=settings.SEMANTIC_CACHE_TTL
+            )
+        except (RedisError, OSError) as e:
+            logger.warning("Semantic cache store failed, skipping: %s", e)
+            return
+        
+        # IVF rebuilds and index flushes are too slow for the event loop
+        index = self._index(workspace_id, request.model)
+        await asyncio.to_thread(index.add, self._vector(text), entry_key)
+    
+    def flush(self):
+        """Persist every index"""
+        for index in self._indexes.values():
+            try:
+                index.flush()
+            except OSError:
+                logger.warning("Failed to persist semantic cache index %s", index.path, exc_info=True)
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,182 @@
+import json
+import secrets
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+# Supported upstream stream framings
+STREAM_FORMATS = ("sse", "ndjson", "length_prefixed")
+
+class StreamDecoder(ABC):
+    """Incrementally splits upstream bytes into decoded payloads"""
+    
+    def __init__(self, done_marker: Optional[str] = None):
+        self.done_marker = done_marker
+        self.done = False
+        self._buffer = b""
+    
+    def feed(self, data: bytes) -> Iterator[Any]:
+        self._buffer += data
+        for frame in self._frames():
+            if self.done:
+                return
+            payload = self._decode(frame)
+            if payload is not None:
+                yield payload
+    
+    def close(self) -> Iterator[Any]:
+        """Decode whatever the upstream left unterminated when it ended"""
+        frame, self._buffer = self._remainder(), b""
+        if frame is None or self.done:
+            return
+        payload = self._decode(frame)
+        if payload is not None:
+            yield payload
+    
+    @abstractmethod
+    def _frames(self) -> Iterator[bytes]:
+        """Complete frames in the buffer, consuming them"""
+    
+    def _remainder(self) -> Optional[bytes]:
+        """The final frame held in an unterminated buffer, if it is usable"""
+        return self._buffer
+    
+    def _decode(self, frame: bytes) -> Any:
+        text = frame.decode("utf-8").strip()
+        if not text:
+            return None
+        if self.done_marker is not None and text == self.done_marker:
+            self.done = True
+            return None
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+class SSEDecoder(StreamDecoder):
+    @staticmethod
+    def _data(event: bytes) -> Optional[bytes]:
+        data_lines = [
+            line[5:].lstrip(b" ") for line in event.split(b"\n") if line.startswith(b"data:")
+        ]
+        return b"\n".join(data_lines) if data_lines else None
+    
+    def _frames(self) -> Iterator[bytes]:
+        self._buffer = self._buffer.replace(b"\r\n", b"\n")
+        while b"\n\n" in self._buffer:
+            event, self._buffer = self._buffer.split(b"\n\n", 1)
+            data = self._data(event)
+            if data is not None:
+                yield data
+    
+    def _remainder(self) -> Optional[bytes]:
+        return self._data(self._buffer.replace(b"\r\n", b"\n"))
+
+class NDJSONDecoder(StreamDecoder):
+    def _frames(self) -> Iterator[bytes]:
+        while b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            yield line
+
+class LengthPrefixedDecoder(StreamDecoder):
+    def __init__(self, done_marker: Optional[str] = None, prefix_bytes: int = 4):
+        super().__init__(done_marker)
+        self.prefix_bytes = prefix_bytes
+    
+    def _frames(self) -> Iterator[bytes]:
+        while len(self._buffer) >= self.prefix_bytes:
+            length = int.from_bytes(self._buffer[:self.prefix_bytes], "big")
+            end = self.prefix_bytes + length
+            if len(self._buffer) < end:
+                return
+            frame, self._buffer = self._buffer[self.prefix_bytes:end], self._buffer[end:]
+            yield frame
+    
+    def _remainder(self) -> Optional[bytes]:
+        # A frame shorter than its length prefix is truncated, not unterminated
+        return None
+
+def create_decoder(stream_format: str, done_marker: Optional[str] = None, prefix_bytes: int = 4) -> StreamDecoder:
+    if stream_format == "sse":
+        return SSEDecoder(done_marker)
+    if stream_format == "ndjson":
+        return NDJSONDecoder(done_marker)
+    if stream_format == "length_prefixed":
+        return LengthPrefixedDecoder(done_marker, prefix_bytes)
+    raise ValueError(f"Unsupported stream format: {stream_format}")
+
+class StreamUsageMeter:
+    """Reads the chat.completion.chunk events a stream relays, so it can be accounted once it ends"""
+    
+    def __init__(self):
+        self._decoder = SSEDecoder(done_marker="[DONE]")
+        self._content: List[str] = []
+        self.usage: Optional[Dict[str, Any]] = None
+    
+    def feed(self, data: bytes):
+        for chunk in self._decoder.feed(data):
+            if not isinstance(chunk, dict):
+                continue
+            # Upstreams that report usage send it on the last chunk
+            if chunk.get("usage"):
+                self.usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                self._content.append((choice.get("delta") or {}).get("content") or "")
+    
+    @property
+    def content(self) -> str:
+        return "".join(self._content)
+
+class UpstreamStream:
+    """Chunks relayed from a streamed upstream response, with the handle that closes it
+    
+    The relaying generator closes the response when it finishes, but a generator that never
+    starts never finishes, so callers must also call aclose() once the response is done.
+    """
+    
+    def __init__(self, response: Any, chunks: AsyncIterator[bytes]):
+        self.response = response
+        self.chunks = chunks
+    
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.chunks
+    
+    async def aclose(self):
+        """Idempotent; returns the upstream connection to the shared pool"""
+        await self.chunks.aclose()
+        await self.response.aclose()
+
+class ChunkEncoder:
+    """Encodes text deltas as OpenAI chat.completion.chunk server-sent events"""
+    
+    def __init__(self, model: str, id_prefix: str = "custom"):
+        self.model = model
+        self.created = int(time.time())
+        self.id = f"{id_prefix}-{secrets.token_hex(12)}"
+        self._started = False
+    
+    def _event(self, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+        chunk = {
+            "id": self.id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+    
+    def content(self, text: str) -> List[bytes]:
+        events = []
+        if not self._started:
+            # The first chunk announces the assistant role, as OpenAI does
+            events.append(self._event({"role": "assistant", "content": ""}))
+            self._started = True
+        if text:
+            events.append(self._event({"content": text}))
+        return events
+    
+    def finish(self, finish_reason: Optional[str] = None) -> List[bytes]:
+        events = self.content("") if not self._started else []
+        events.append(self._event({}, finish_reason or "stop"))
+        events.append(b"data: [DONE]\n\n")
+        return events
@@ -0,0 +1,15 @@
+from app.schemas.chat import ChatCompletionRequest
+
+# Rough averages for English text with BPE tokenizers; estimates only need to be the right size
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4  # Role and separators
+TOKENS_PER_REQUEST = 3  # Priming for the reply
+
+def estimate_text_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def estimate_prompt_tokens(request: ChatCompletionRequest) -> int:
+    """Tokenizer-free estimate of a request's prompt size"""
+    return TOKENS_PER_REQUEST + sum(
+        TOKENS_PER_MESSAGE + estimate_text_tokens(msg.content) for msg in request.messages
+    )
@@ -2,6 +2,7 @@ from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
+from app.core.tracing import span
 from app.models.requestlog import RequestLog
 from app.models.apikey import APIKey
 from app.models.model import Model
@@ -28,34 +29,52 @@ class UsageTracker:
         ip_address: Optional[str] = None
     ) -> RequestLog:
         """Log a completed request"""
-        request_log = RequestLog(
-            workspace_id=workspace_id,
-            model_id=model_id,
-            api_key_id=api_key_id,
-            model_name=model_name,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-            latency_ms=latency_ms,
-            success=success,
-            error_message=error_message,
-            cost_usd=cost_usd,
-            user_agent=user_agent,
-            ip_address=ip_address
-        )
-        
-        self.db.add(request_log)
-        self.db.commit()
-        self.db.refresh(request_log)
-        
-        # Update API key last used timestamp
-        api_key = self.db.query(APIKey).filter(APIKey.id == api_key_id).first()
-        if api_key:
-            api_key.last_used_at = datetime.utcnow()
+        with span("usage.log_request", success=success):
+            request_log = RequestLog(
+                workspace_id=workspace_id,
+                model_id=model_id,
+                api_key_id=api_key_id,
+                model_name=model_name,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens,
+                latency_ms=latency_ms,
+                success=success,
+                error_message=error_message,
+                cost_usd=cost_usd,
+                user_agent=user_agent,
+                ip_address=ip_address
+            )
+            
+            self.db.add(request_log)
             self.db.commit()
+            self.db.refresh(request_log)
+            
+            # Update API key last used timestamp
+            api_key = self.db.query(APIKey).filter(APIKey.id == api_key_id).first()
+            if api_key:
+                api_key.last_used_at = datetime.utcnow()
+                self.db.commit()
         
         return request_log
     
+    def log_requests(self, entries: List[Dict[str, Any]]) -> int:
+        """Log many completed requests in a single transaction"""
+        if not entries:
+            return 0
+        
+        self.db.add_all([RequestLog(**entry) for entry in entries])
+        
+        # Touch each API key once rather than once per request
+        api_key_ids = {entry["api_key_id"] for entry in entries}
+        self.db.query(APIKey).filter(APIKey.id.in_(api_key_ids)).update(
+            {APIKey.last_used_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        
+        self.db.commit()
+        return len(entries)
+    
     def get_workspace_usage(
         self,
         workspace_id: int,
@@ -0,0 +1,29 @@
+import time
+from typing import Dict, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import User
+
+class UserStatusCache:
+    """Whether each user is active, so token auth only hits the database once per TTL"""
+    
+    def __init__(self):
+        self._entries: Dict[int, Tuple[float, bool]] = {}
+    
+    def is_active(self, db: Session, user_id: int) -> bool:
+        """Return the user's active flag, from cache when fresh; unknown users are inactive"""
+        entry = self._entries.get(user_id)
+        # Nothing in the app deactivates users, so there is no invalidation event; the TTL is the
+        # only bound on how long a user deactivated in the database keeps access
+        if entry and time.monotonic() - entry[0] < settings.USER_STATUS_CACHE_TTL:
+            return entry[1]
+        
+        row = db.query(User.is_active).filter(User.id == user_id).first()
+        active = bool(row and row.is_active)
+        self.set(user_id, active)
+        return active
+    
+    def set(self, user_id: int, active: bool):
+        self._entries[user_id] = (time.monotonic(), active)
+
+user_status_cache = UserStatusCache()
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import time
+from typing import List
+from app.core import security
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.lifecycle import boot_timer
+from app.models.provider import Provider
+from app.services.api_key_cache import api_key_cache
+from app.services.provider_manager import ProviderManager
+from app.services.routing import route_table
+
+logger = logging.getLogger(__name__)
+
+def _load_caches() -> List[object]:
+    """Fill the route table and key cache, returning adapters for every active provider"""
+    db = SessionLocal()
+    try:
+        route_table.refresh(db)
+        keys = api_key_cache.prime(db, settings.PREWARM_API_KEYS)
+        
+        provider_manager = ProviderManager(db)
+        adapters = []
+        for provider in db.query(Provider).filter(Provider.is_active == True).all():
+            try:
+                adapters.append(provider_manager.get_adapter(provider))
+            except Exception:
+                logger.warning("Could not build adapter for provider %s", provider.id)
+        logger.info("Prewarmed %d API keys and %d provider adapters", keys, len(adapters))
+        return adapters
+    finally:
+        db.close()
+
+async def prewarm():
+    """Warm caches, lazy imports and upstream connection pools so the first requests don't pay for them"""
+    start_time = time.perf_counter()
+    try:
+        await asyncio.to_thread(security.warm_up)
+        adapters = await asyncio.to_thread(_load_caches)
+        # A health probe opens a pooled keep-alive connection to each upstream
+        await asyncio.gather(
+            *(adapter.async_health_check(timeout=settings.PREWARM_TIMEOUT) for adapter in adapters),
+            return_exceptions=True
+        )
+    except Exception:
+        logger.exception("Prewarm failed")
+    finally:
+        boot_timer.mark("prewarmed")
+        logger.info("Prewarm took %.0f ms", (time.perf_counter() - start_time) * 1000)
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
+import { authService } from '../services/authService';
 import { 
   Activity, 
   Key, 
@@ -7,35 +8,70 @@ import {
   Settings, 
   MessageSquare, 
   TrendingUp,
-  Users,
+  AlertTriangle,
+  Clock,
   Zap
 } from 'lucide-react';
 
 const Dashboard = () => {
   const [stats, setStats] = useState({
-    totalRequests: 0,
-    totalTokens: 0,
-    activeModels: 0,
-    activeProviders: 0
+    rps: 0,
+    tokens_per_second: 0,
+    error_rate: 0,
+    latency_ms: { p50: 0, p99: 0 }
   });
+  const [connected, setConnected] = useState(false);
 
   const [recentActivity, setRecentActivity] = useState([]);
 
   useEffect(() => {
-    // Fetch dashboard stats
-    fetchDashboardStats();
     fetchRecentActivity();
-  }, []);
 
-  const fetchDashboardStats = async () => {
-    // TODO: Implement API call to fetch stats
-    setStats({
-      totalRequests: 1250,
-      totalTokens: 45000,
-      activeModels: 8,
-      activeProviders: 3
-    });
-  };
+    // The server pushes a snapshot every second. Stream tickets are short-lived, so every
+    // (re)connect fetches a fresh one instead of letting EventSource retry a stale URL
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const reconnect = () => {
+      setConnected(false);
+      if (!closed) {
+        retryTimer = setTimeout(connect, 3000);
+      }
+    };
+
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = await authService.getLiveMetricsTicket();
+      } catch (error) {
+        // The shared client already sends an expired session back to the login page
+        if (error.response?.status === 401) {
+          setConnected(false);
+        } else {
+          reconnect();
+        }
+        return;
+      }
+
+      if (closed) return;
+      source = new EventSource(authService.liveMetricsUrl(ticket));
+      source.onopen = () => setConnected(true);
+      source.onmessage = (event) => setStats(JSON.parse(event.data));
+      source.onerror = () => {
+        source.close();
+        reconnect();
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
 
   const fetchRecentActivity = async () => {
     // TODO: Implement API call to fetch recent activity
@@ -103,8 +139,8 @@ const Dashboard = () => {
             <p className="text-gray-600">Welcome to your BYOM AI Platform workspace</p>
           </div>
           <div className="flex items-center space-x-2">
-            <div className="w-3 h-3 bg-green-400 rounded-full"></div>
-            <span className="text-sm text-gray-600">All systems operational</span>
+            <div className={`w-3 h-3 rounded-full ${connected ? 'bg-green-400' : 'bg-gray-300'}`}></div>
+            <span className="text-sm text-gray-600">{connected ? 'Live' : 'Reconnecting...'}</span>
           </div>
         </div>
       </div>
@@ -117,8 +153,8 @@ const Dashboard = () => {
               <Activity className="h-6 w-6 text-blue-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Total Requests</p>
-              <p className="text-2xl font-semibold text-gray-900">{stats.totalRequests.toLocaleString()}</p>
+              <p className="text-sm font-medium text-gray-600">Requests / sec</p>
+              <p className="text-2xl font-semibold text-gray-900">{stats.rps.toFixed(2)}</p>
             </div>
           </div>
         </div>
@@ -129,8 +165,8 @@ const Dashboard = () => {
               <Zap className="h-6 w-6 text-green-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Total Tokens</p>
-              <p className="text-2xl font-semibold text-gray-900">{stats.totalTokens.toLocaleString()}</p>
+              <p className="text-sm font-medium text-gray-600">Tokens / sec</p>
+              <p className="text-2xl font-semibold text-gray-900">{Math.round(stats.tokens_per_second).toLocaleString()}</p>
             </div>
           </div>
         </div>
@@ -138,11 +174,11 @@ const Dashboard = () => {
         <div className="bg-white shadow rounded-lg p-6">
           <div className="flex items-center">
             <div className="p-2 bg-purple-100 rounded-lg">
-              <Settings className="h-6 w-6 text-purple-600" />
+              <AlertTriangle className="h-6 w-6 text-purple-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Active Models</p>
-              <p className="text-2xl font-semibold text-gray-900">{stats.activeModels}</p>
+              <p className="text-sm font-medium text-gray-600">Error Rate</p>
+              <p className="text-2xl font-semibold text-gray-900">{(stats.error_rate * 100).toFixed(1)}%</p>
             </div>
           </div>
         </div>
@@ -150,11 +186,11 @@ const Dashboard = () => {
         <div className="bg-white shadow rounded-lg p-6">
           <div className="flex items-center">
             <div className="p-2 bg-orange-100 rounded-lg">
-              <Database className="h-6 w-6 text-orange-600" />
+              <Clock className="h-6 w-6 text-orange-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Active Providers</p>
-              <p className="text-2xl font-semibold text-gray-900">{stats.activeProviders}</p>
+              <p className="text-sm font-medium text-gray-600">Latency p50 / p99</p>
+              <p className="text-2xl font-semibold text-gray-900">{Math.round(stats.latency_ms.p50)} / {Math.round(stats.latency_ms.p99)} ms</p>
             </div>
           </div>
         </div>
@@ -78,6 +78,16 @@ class AuthService {
     }
   }
 
+  // EventSource can't send headers, so the live metrics stream is opened with a short-lived ticket
+  async getLiveMetricsTicket() {
+    const response = await api.post('/admin/metrics/live/ticket');
+    return response.data.ticket;
+  }
+
+  liveMetricsUrl(ticket) {
+    return `${api.defaults.baseURL}/admin/metrics/live?ticket=${encodeURIComponent(ticket)}`;
+  }
+
   async logout() {
     try {
       await api.post('/auth/logout');
@@ -0,0 +1,35 @@
+import os
+
+def _available_cores() -> int:
+    # Respects CPU affinity / container cpusets where the platform exposes them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", _available_cores()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Long streamed completions must be able to finish during a deploy
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Workers size their DB pools from this, so it must match the real worker count
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Workers inherit this and only verify the schema the master prepared
+os.environ.setdefault("FAST_BOOT", "true")
+
+def on_starting(server):
+    """Create tables once in the master so workers don't race each other"""
+    import app.models  # noqa: F401  Registers every table on Base
+    from app.core.db import engine
+    from app.core.schema import ensure_schema
+    ensure_schema()
+    # Forked workers must not inherit the master's pooled connections
+    engine.dispose()